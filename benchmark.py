@@ -0,0 +1,377 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+LightComics 서버 성능 측정 도구
+
+합성 라이브러리(중첩 디렉토리, 무압축/압축 ZIP, CBZ, RAR, cp949 파일 이름)를 만들고
+lightcomics.py 를 별도 프로세스로 실행한 뒤 주요 API를 동시에 호출하여
+지연시간(p50/p99), 처리량, 최대 메모리(RSS)를 JSON으로 기록한다. (리눅스 전용)
+
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json
+    python benchmark.py --compare before.json after.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import zipfile
+from io import BytesIO
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from PIL import Image
+from PIL import ImageDraw
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_SCRIPT = os.path.join(BASE_DIR, "lightcomics.py")
+USERNAME = "LightComics"
+PASSWORD = "benchmark"
+
+SCENARIOS = ['listing', 'model_mode0', 'model_mode1', 'page', 'identifier']
+
+
+# cp949 이름을 UTF-8 플래그 없이 기록하는 ZipInfo (윈도우 한글 압축 프로그램과 같은 형태)
+class LegacyZipInfo(zipfile.ZipInfo):
+    def _encodeFilenameFlags(self):
+        return self.filename.encode('cp949'), self.flag_bits & ~0x800
+
+
+def make_page_images(count, width, height, seed):
+    """ JPEG 페이지 이미지 count개를 생성하여 반환한다 """
+    rnd = random.Random(seed)
+    pages = []
+    for i in range(count):
+        image = Image.new('RGB', (width, height),
+                          (rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(40):
+            x, y = rnd.randrange(width), rnd.randrange(height)
+            draw.rectangle((x, y, x + rnd.randrange(width // 2), y + rnd.randrange(height // 4)),
+                           fill=(rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)))
+        data = BytesIO()
+        image.save(data, format='JPEG', quality=85)
+        pages.append(data.getvalue())
+    return pages
+
+
+def write_zip(archive_path, pages, page_count, compression, legacy_names=False):
+    """ 페이지 page_count개가 들어있는 zip 파일을 생성하고 서버가 사용하는 멤버 이름을 반환한다 """
+    names = []
+    with zipfile.ZipFile(archive_path, 'w', compression) as archive:
+        for i in range(page_count):
+            if legacy_names:
+                info = LegacyZipInfo("페이지_%03d.jpg" % i)
+                # UTF-8 플래그가 없는 이름은 cp437로 읽힌다
+                names.append(info.filename.encode('cp949').decode('cp437'))
+            else:
+                info = zipfile.ZipInfo("page_%03d.jpg" % i)
+                names.append(info.filename)
+            info.compress_type = compression
+            archive.writestr(info, pages[i % len(pages)])
+    return names
+
+
+def write_rar(rar_tool, archive_path, pages, page_count, solid):
+    """ rar 도구로 페이지 page_count개가 들어있는 rar 파일을 생성하고 멤버 이름을 반환한다 """
+    work_path = tempfile.mkdtemp()
+    try:
+        names = []
+        for i in range(page_count):
+            name = "page_%03d.jpg" % i
+            with open(os.path.join(work_path, name), 'wb') as f:
+                f.write(pages[i % len(pages)])
+            names.append(name)
+        cmdline = [rar_tool, 'a', '-inul', '-ep1'] + (['-s'] if solid else ['-s-'])
+        subprocess.check_call(cmdline + [os.path.abspath(archive_path)] + names, cwd=work_path)
+    finally:
+        shutil.rmtree(work_path)
+    return names
+
+
+def generate_library(root, args):
+    """ 합성 라이브러리를 생성하고 (디렉토리 목록, 압축파일 경로 -> 멤버 이름 목록)을 반환한다 """
+    pages = make_page_images(args.distinct_pages, args.width, args.height, args.seed)
+    rar_tool = shutil.which('rar')
+
+    directories = []
+    archives = {}
+    for series in range(args.series):
+        directories.append("series_%02d" % series)
+        for volume in range(args.volumes):
+            rel_path = "series_%02d/volume_%02d" % (series, volume)
+            dir_path = os.path.join(root, rel_path)
+            os.makedirs(dir_path, exist_ok=True)
+            directories.append(rel_path)
+
+            archives[rel_path + "/stored.cbz"] = write_zip(
+                os.path.join(dir_path, "stored.cbz"), pages, args.pages, zipfile.ZIP_STORED)
+            archives[rel_path + "/deflated.zip"] = write_zip(
+                os.path.join(dir_path, "deflated.zip"), pages, args.pages, zipfile.ZIP_DEFLATED)
+            archives[rel_path + "/한글.zip"] = write_zip(
+                os.path.join(dir_path, "한글.zip"), pages, args.pages, zipfile.ZIP_DEFLATED,
+                legacy_names=True)
+            if rar_tool is not None:
+                archives[rel_path + "/solid.cbr"] = write_rar(
+                    rar_tool, os.path.join(dir_path, "solid.cbr"), pages, args.pages, True)
+                archives[rel_path + "/normal.rar"] = write_rar(
+                    rar_tool, os.path.join(dir_path, "normal.rar"), pages, args.pages, False)
+
+    return directories, archives
+
+
+def get_free_port():
+    """ 사용 가능한 포트를 반환한다 """
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(work_path, root, port, args):
+    """ 임시 설정으로 서버를 실행하고 프로세스를 반환한다 """
+    conf = {
+        "ROOT": root,
+        "PORT": port,
+        "HOST": "127.0.0.1",
+        "PASSWORD": PASSWORD,
+        "CACHE_PATH": os.path.join(work_path, "cache"),
+        "SERVER_MODE": args.server_mode,
+        "LOG_LEVEL": "WARNING",
+    }
+    with open(os.path.join(work_path, "lightcomics.json"), 'w') as f:
+        json.dump(conf, f)
+
+    log = open(os.path.join(work_path, "server.log"), 'wb')
+    proc = subprocess.Popen([sys.executable, SERVER_SCRIPT], cwd=work_path,
+                            stdout=log, stderr=subprocess.STDOUT)
+    url = "http://127.0.0.1:%d/" % port
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("server exited, see %s" % log.name)
+        try:
+            requests.get(url, auth=(USERNAME, PASSWORD), timeout=1)
+            return proc
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("server did not start, see %s" % log.name)
+
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def get_process_tree(pid):
+    """ 프로세스(pid)와 모든 자식 프로세스의 pid를 반환한다 """
+    pids = [pid]
+    for current in pids:
+        try:
+            tasks = os.listdir("/proc/%d/task" % current)
+        except OSError:
+            continue
+        for task in tasks:
+            try:
+                with open("/proc/%d/task/%s/children" % (current, task)) as f:
+                    pids.extend(int(child) for child in f.read().split())
+            except OSError:
+                pass
+    return pids
+
+
+def get_peak_rss_kb(pid):
+    """ 프로세스 트리의 최대 RSS(VmHWM) 중 가장 큰 값을 KB 단위로 반환한다 """
+    peak = 0
+    for current in get_process_tree(pid):
+        try:
+            with open("/proc/%d/status" % current) as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        peak = max(peak, int(line.split()[1]))
+        except OSError:
+            pass
+    return peak
+
+
+def get_targets(directories, archives):
+    """ 시나리오별 요청 경로 목록을 반환한다 """
+    pages = [quote(archive) + "/" + quote(name)
+             for archive, names in archives.items() for name in names]
+    return {
+        'listing': [quote(path) + "/" for path in directories],
+        'model_mode0': [quote(path) + "/?mode=0" for path in archives],
+        'model_mode1': [quote(path) + "/?mode=1" for path in archives],
+        'page': pages,
+        'identifier': ["id/" + quote(path) for path in archives],
+    }
+
+
+def percentile(values, ratio):
+    """ 정렬된 값(values)의 ratio 분위수를 반환한다 """
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(ratio * len(values))) - 1))
+    return values[index]
+
+
+def run_scenario(base_url, paths, requests_count, concurrency):
+    """ paths를 순서대로 반복하며 requests_count개의 요청을 동시에 보내고 결과를 반환한다 """
+    local = threading.local()
+
+    def fetch(path):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+            session.auth = (USERNAME, PASSWORD)
+        start = time.perf_counter()
+        response = session.get(base_url + path)
+        size = len(response.content)
+        return time.perf_counter() - start, response.status_code, size
+
+    order = [paths[i % len(paths)] for i in range(requests_count)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(fetch, order))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(result[0] for result in results)
+    return {
+        'requests': len(results),
+        'errors': sum(1 for result in results if result[1] >= 400),
+        'bytes': sum(result[2] for result in results),
+        'seconds': round(elapsed, 4),
+        'throughput_rps': round(len(results) / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+    }
+
+
+def get_git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=BASE_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(args):
+    """ 라이브러리를 생성하고 서버를 실행하여 측정 결과를 반환한다 """
+    work_path = tempfile.mkdtemp(prefix="lightcomics-bench-")
+    root = os.path.join(work_path, "library", "")
+    try:
+        directories, archives = generate_library(root, args)
+        targets = get_targets(directories, archives)
+        port = get_free_port()
+        proc = start_server(work_path, root, port, args)
+        try:
+            base_url = "http://127.0.0.1:%d/" % port
+
+            scenarios = {}
+            for name in args.scenarios:
+                # 첫 번째 실행은 캐시가 비어있는 상태를 측정한다
+                scenarios[name + "_cold"] = run_scenario(base_url, targets[name],
+                                                         len(targets[name]), args.concurrency)
+                scenarios[name] = run_scenario(base_url, targets[name],
+                                               args.requests, args.concurrency)
+            peak_rss_kb = get_peak_rss_kb(proc.pid)
+        finally:
+            stop_server(proc)
+    finally:
+        if args.keep:
+            print("work directory: " + work_path, file=sys.stderr)
+        else:
+            shutil.rmtree(work_path, ignore_errors=True)
+
+    return {
+        'meta': {
+            'revision': get_git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'time': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            'params': {key: value for key, value in vars(args).items()
+                       if key not in ('output', 'compare', 'keep')},
+            'library': {'directories': len(directories), 'archives': len(archives),
+                        'pages': sum(len(names) for names in archives.values()),
+                        'rar': shutil.which('rar') is not None},
+        },
+        'peak_rss_kb': peak_rss_kb,
+        'scenarios': scenarios,
+    }
+
+
+def compare_results(before_path, after_path):
+    """ 두 결과 파일을 비교하여 시나리오별 변화율을 반환한다 """
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    def change(old, new):
+        if not old:
+            return None
+        return round((new - old) / old * 100, 2)
+
+    comparison = {'peak_rss_kb': {'before': before['peak_rss_kb'], 'after': after['peak_rss_kb'],
+                                  'change_pct': change(before['peak_rss_kb'], after['peak_rss_kb'])},
+                  'scenarios': {}}
+    for name, old in before['scenarios'].items():
+        new = after['scenarios'].get(name)
+        if new is None:
+            continue
+        comparison['scenarios'][name] = {
+            key: {'before': old[key], 'after': new[key], 'change_pct': change(old[key], new[key])}
+            for key in ('p50_ms', 'p99_ms', 'throughput_rps')}
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LightComics server benchmark")
+    parser.add_argument('--series', type=int, default=3, help="top level directories")
+    parser.add_argument('--volumes', type=int, default=4, help="sub directories per series")
+    parser.add_argument('--pages', type=int, default=40, help="pages per archive")
+    parser.add_argument('--width', type=int, default=1200)
+    parser.add_argument('--height', type=int, default=1700)
+    parser.add_argument('--distinct-pages', type=int, default=8, help="distinct page images to cycle")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--requests', type=int, default=500, help="requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--server-mode', choices=['development', 'production'], default='development')
+    parser.add_argument('--output', help="write results to this file instead of stdout")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help="compare two result files")
+    parser.add_argument('--keep', action='store_true', help="keep the generated library and logs")
+    args = parser.parse_args()
+
+    if args.compare:
+        result = compare_results(*args.compare)
+    else:
+        result = run_benchmark(args)
+
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
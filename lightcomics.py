@@ -7,6 +7,8 @@ import time
 import datetime
 import json
 import zipfile
+import zlib
+import gzip
 import struct
 import imghdr
 import platform
@@ -15,12 +17,17 @@ import chardet
 import flask
 import re
 import socket
+import select
+import errno
+import ctypes
+import ctypes.util
 import threading
 import requests
 from flask import request
 from PIL import Image
 from io import BytesIO
 from werkzeug.routing import BaseConverter
+from werkzeug.wsgi import wrap_file
 from functools import wraps
 from io import StringIO
 import tkinter as tk
@@ -28,13 +35,46 @@ from tkinter import filedialog
 from tkinter import messagebox
 from urllib.request import urlopen
 from urllib.parse import unquote
+from urllib.parse import quote
 import importlib
+import heapq
+import bisect
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import multiprocessing
+import hashlib
+import cProfile
+import pstats
+import random
+from collections import deque
+import mimetypes
+import unicodedata
+import sqlite3
+from collections import OrderedDict
+from itertools import islice
+
+BROTLI_SPEC = importlib.util.find_spec("brotli")
+IS_INSTALLED_BROTLI_MODULE = BROTLI_SPEC is not None
+if IS_INSTALLED_BROTLI_MODULE:
+    import brotli
 
 RAR_FILE_SPEC = importlib.util.find_spec("rarfile")
 IS_INSTALLED_RAR_FILE_MODULE = RAR_FILE_SPEC is not None
 if IS_INSTALLED_RAR_FILE_MODULE:
     import rarfile
 
+FCNTL_SPEC = importlib.util.find_spec("fcntl")
+IS_INSTALLED_FCNTL_MODULE = FCNTL_SPEC is not None
+if IS_INSTALLED_FCNTL_MODULE:
+    import fcntl
+
+GUNICORN_SPEC = importlib.util.find_spec("gunicorn")
+IS_INSTALLED_GUNICORN_MODULE = GUNICORN_SPEC is not None
+if IS_INSTALLED_GUNICORN_MODULE:
+    from gunicorn.app.base import BaseApplication
+
 
 # 버전
 __version__ = (1, 0, 3)
@@ -65,8 +105,54 @@ CONF_ROOT_PATH = ""
 CONF_SERVER_PORT = DEFAULT_PORT
 CONF_PASSWORD = ""
 CONF_HOST = "0.0.0.0"
+CONF_ARCHIVE_CACHE_SIZE = 32
+CONF_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".lightcomics")
+CONF_STREAM_CHUNK_SIZE = 64 * 1024
+CONF_PAGE_MAX_AGE = 3600
+CONF_TRANSCODE_CACHE_SIZE = 512
+CONF_TRANSCODE_QUALITY = 80
+CONF_EXTRACT_CACHE_SIZE = 1024
+CONF_PAGE_CACHE_SIZE = 128
+CONF_PREFETCH_PAGES = 3
+CONF_PREFETCH_WORKERS = 2
+CONF_DIMENSION_WORKERS = 4
+CONF_DIMENSION_PROCESSES = 0
+CONF_COVER_WIDTH = 240
+CONF_COVER_HEIGHT = 360
+CONF_COVER_QUALITY = 75
+CONF_COVER_CACHE_SIZE = 64
+CONF_COVER_WORKERS = 1
+CONF_COVER_BATCH_MAX = 100
+CONF_SERVER_MODE = "development"
+CONF_WORKERS = 2
+CONF_THREADS = 8
+CONF_KEEPALIVE = 5
+CONF_TIMEOUT = 120
+CONF_GRACEFUL_TIMEOUT = 30
+CONF_SIZE_INDEX_TTL = 10
+CONF_SIZE_INDEX_FILE_TTL = 3600
+CONF_CATALOG_ENABLED = True
+CONF_CATALOG_RESCAN_INTERVAL = 300
+CONF_SEARCH_LIMIT = 50
+CONF_BATCH_MAX_PAGES = 64
+CONF_LISTING_CACHE_SIZE = 256
+CONF_JSON_PRETTY = False
+CONF_COMPRESS_MIN_SIZE = 1024
+CONF_DOWNLOAD_RATE_LIMIT = 0
+CONF_DOWNLOAD_TOTAL_RATE_LIMIT = 0
+CONF_LOG_LEVEL = "INFO"
+CONF_PROFILE_ENABLED = False
+CONF_PROFILE_SAMPLE_RATE = 0.0
+CONF_PROFILE_MAX_FILES = 50
+CONF_VOLUMES = []
+CONF_VOLUME_AUTO_DETECT = False
+CONF_VOLUME_SCAN_DEPTH = 2
+CONF_VOLUME_WORKERS = 4
+CONF_VOLUME_QUEUE_SIZE = 32
+CONF_VOLUME_TIMEOUT = 120
 
 BASE_MIME_TYPE = "application/json"
+NDJSON_MIME_TYPE = "application/x-ndjson"
 
 if IS_OS_WINDOWS:
     CONF_ROOT_PATH = "c:/"
@@ -84,6 +170,51 @@ elif IS_OS_LINUX:
     CONF_SERVER_PORT = CONF['PORT']
     CONF_PASSWORD = CONF['PASSWORD']
     CONF_HOST = CONF['HOST']
+    CONF_ARCHIVE_CACHE_SIZE = CONF.get('ARCHIVE_CACHE_SIZE', CONF_ARCHIVE_CACHE_SIZE)
+    CONF_CACHE_PATH = os.path.expanduser(CONF.get('CACHE_PATH', CONF_CACHE_PATH))
+    CONF_STREAM_CHUNK_SIZE = CONF.get('STREAM_CHUNK_SIZE', CONF_STREAM_CHUNK_SIZE)
+    CONF_PAGE_MAX_AGE = CONF.get('PAGE_MAX_AGE', CONF_PAGE_MAX_AGE)
+    CONF_TRANSCODE_CACHE_SIZE = CONF.get('TRANSCODE_CACHE_SIZE', CONF_TRANSCODE_CACHE_SIZE)
+    CONF_TRANSCODE_QUALITY = CONF.get('TRANSCODE_QUALITY', CONF_TRANSCODE_QUALITY)
+    CONF_EXTRACT_CACHE_SIZE = CONF.get('EXTRACT_CACHE_SIZE', CONF_EXTRACT_CACHE_SIZE)
+    CONF_PAGE_CACHE_SIZE = CONF.get('PAGE_CACHE_SIZE', CONF_PAGE_CACHE_SIZE)
+    CONF_PREFETCH_PAGES = CONF.get('PREFETCH_PAGES', CONF_PREFETCH_PAGES)
+    CONF_PREFETCH_WORKERS = CONF.get('PREFETCH_WORKERS', CONF_PREFETCH_WORKERS)
+    CONF_DIMENSION_WORKERS = CONF.get('DIMENSION_WORKERS', CONF_DIMENSION_WORKERS)
+    CONF_DIMENSION_PROCESSES = CONF.get('DIMENSION_PROCESSES', CONF_DIMENSION_PROCESSES)
+    CONF_COVER_WIDTH = CONF.get('COVER_WIDTH', CONF_COVER_WIDTH)
+    CONF_COVER_HEIGHT = CONF.get('COVER_HEIGHT', CONF_COVER_HEIGHT)
+    CONF_COVER_QUALITY = CONF.get('COVER_QUALITY', CONF_COVER_QUALITY)
+    CONF_COVER_CACHE_SIZE = CONF.get('COVER_CACHE_SIZE', CONF_COVER_CACHE_SIZE)
+    CONF_COVER_WORKERS = CONF.get('COVER_WORKERS', CONF_COVER_WORKERS)
+    CONF_COVER_BATCH_MAX = CONF.get('COVER_BATCH_MAX', CONF_COVER_BATCH_MAX)
+    CONF_SERVER_MODE = CONF.get('SERVER_MODE', CONF_SERVER_MODE)
+    CONF_WORKERS = CONF.get('WORKERS', CONF_WORKERS)
+    CONF_THREADS = CONF.get('THREADS', CONF_THREADS)
+    CONF_KEEPALIVE = CONF.get('KEEPALIVE', CONF_KEEPALIVE)
+    CONF_TIMEOUT = CONF.get('TIMEOUT', CONF_TIMEOUT)
+    CONF_GRACEFUL_TIMEOUT = CONF.get('GRACEFUL_TIMEOUT', CONF_GRACEFUL_TIMEOUT)
+    CONF_SIZE_INDEX_TTL = CONF.get('SIZE_INDEX_TTL', CONF_SIZE_INDEX_TTL)
+    CONF_SIZE_INDEX_FILE_TTL = CONF.get('SIZE_INDEX_FILE_TTL', CONF_SIZE_INDEX_FILE_TTL)
+    CONF_CATALOG_ENABLED = CONF.get('CATALOG_ENABLED', CONF_CATALOG_ENABLED)
+    CONF_CATALOG_RESCAN_INTERVAL = CONF.get('CATALOG_RESCAN_INTERVAL', CONF_CATALOG_RESCAN_INTERVAL)
+    CONF_SEARCH_LIMIT = CONF.get('SEARCH_LIMIT', CONF_SEARCH_LIMIT)
+    CONF_BATCH_MAX_PAGES = CONF.get('BATCH_MAX_PAGES', CONF_BATCH_MAX_PAGES)
+    CONF_LISTING_CACHE_SIZE = CONF.get('LISTING_CACHE_SIZE', CONF_LISTING_CACHE_SIZE)
+    CONF_JSON_PRETTY = CONF.get('JSON_PRETTY', CONF_JSON_PRETTY)
+    CONF_COMPRESS_MIN_SIZE = CONF.get('COMPRESS_MIN_SIZE', CONF_COMPRESS_MIN_SIZE)
+    CONF_DOWNLOAD_RATE_LIMIT = CONF.get('DOWNLOAD_RATE_LIMIT', CONF_DOWNLOAD_RATE_LIMIT)
+    CONF_DOWNLOAD_TOTAL_RATE_LIMIT = CONF.get('DOWNLOAD_TOTAL_RATE_LIMIT', CONF_DOWNLOAD_TOTAL_RATE_LIMIT)
+    CONF_LOG_LEVEL = CONF.get('LOG_LEVEL', CONF_LOG_LEVEL)
+    CONF_PROFILE_ENABLED = CONF.get('PROFILE_ENABLED', CONF_PROFILE_ENABLED)
+    CONF_PROFILE_SAMPLE_RATE = CONF.get('PROFILE_SAMPLE_RATE', CONF_PROFILE_SAMPLE_RATE)
+    CONF_PROFILE_MAX_FILES = CONF.get('PROFILE_MAX_FILES', CONF_PROFILE_MAX_FILES)
+    CONF_VOLUMES = CONF.get('VOLUMES', CONF_VOLUMES)
+    CONF_VOLUME_AUTO_DETECT = CONF.get('VOLUME_AUTO_DETECT', CONF_VOLUME_AUTO_DETECT)
+    CONF_VOLUME_SCAN_DEPTH = CONF.get('VOLUME_SCAN_DEPTH', CONF_VOLUME_SCAN_DEPTH)
+    CONF_VOLUME_WORKERS = CONF.get('VOLUME_WORKERS', CONF_VOLUME_WORKERS)
+    CONF_VOLUME_QUEUE_SIZE = CONF.get('VOLUME_QUEUE_SIZE', CONF_VOLUME_QUEUE_SIZE)
+    CONF_VOLUME_TIMEOUT = CONF.get('VOLUME_TIMEOUT', CONF_VOLUME_TIMEOUT)
     if not os.path.exists(CONF_ROOT_PATH):
         print("루트 디렉토리를 찾을 수 없습니다. lightcomics.json 파일의 ROOT 경로를 확인해주세요.")
         exit(0)
@@ -91,6 +222,10 @@ else:
     print("운영체제를 확인할 수 없습니다.")
     exit(0)
 
+# 로그 레벨 설정 (요청마다 남기는 로그는 DEBUG 레벨이다)
+logging.getLogger().setLevel(CONF_LOG_LEVEL)
+logger.setLevel(CONF_LOG_LEVEL)
+
 
 # 앱 선언
 app = flask.Flask(__name__)
@@ -119,21 +254,144 @@ def requires_authenticate(f):
     return decorated
 
 
-# JSON Encoder
-class LightEncoder(json.JSONEncoder):
-    def default(self, o):
-        return o.__dict__
+# 지표 (Prometheus 텍스트 형식, 워커 프로세스 단위로 집계된다)
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 이름 -> (종류, 설명)
+        self._descriptions = OrderedDict()
+        # 이름 -> {레이블: 값}
+        self._counters = {}
+        # 이름 -> {레이블: [구간별 개수, 합계, 개수]}
+        self._histograms = {}
+
+    def describe(self, name, kind, text):
+        self._descriptions[name] = (kind, text)
+
+    def inc(self, name, value=1, **labels):
+        """ 카운터(name)를 value만큼 증가시킨다 """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            values = self._counters.setdefault(name, {})
+            values[key] = values.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """ 히스토그램(name)에 value를 기록한다 """
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(METRICS_LATENCY_BUCKETS, value)
+        with self._lock:
+            values = self._histograms.setdefault(name, {})
+            histogram = values.get(key)
+            if histogram is None:
+                histogram = values[key] = [[0] * (len(METRICS_LATENCY_BUCKETS) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def inc_cache(self, cache, hit):
+        """ 캐시(cache)의 적중 여부를 기록한다 """
+        self.inc('lightcomics_cache_requests_total', cache=cache,
+                 result='hit' if hit else 'miss')
+
+    @staticmethod
+    def _format_labels(labels, **extra):
+        items = list(labels) + sorted(extra.items())
+        if not items:
+            return ""
+        return "{%s}" % ",".join(
+            '%s="%s"' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+            for key, value in items)
+
+    def render(self):
+        """ 지표를 Prometheus 텍스트 형식으로 반환한다 """
+        with self._lock:
+            counters = {name: dict(values) for name, values in self._counters.items()}
+            histograms = {name: {key: [list(h[0]), h[1], h[2]] for key, h in values.items()}
+                          for name, values in self._histograms.items()}
+
+        lines = []
+        for name, (kind, text) in self._descriptions.items():
+            lines.append("# HELP %s %s" % (name, text))
+            lines.append("# TYPE %s %s" % (name, kind))
+            for key, value in sorted(counters.get(name, {}).items()):
+                lines.append("%s%s %s" % (name, self._format_labels(key), repr(float(value))))
+            for key, (counts, total, count) in sorted(histograms.get(name, {}).items()):
+                cumulative = 0
+                for bound, bucket_count in zip(METRICS_LATENCY_BUCKETS + ('+Inf',), counts):
+                    cumulative += bucket_count
+                    lines.append("%s_bucket%s %d" % (name, self._format_labels(key, le=bound), cumulative))
+                lines.append("%s_sum%s %s" % (name, self._format_labels(key), repr(total)))
+                lines.append("%s_count%s %d" % (name, self._format_labels(key), count))
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+metrics.describe('lightcomics_http_requests_total', 'counter', "HTTP requests by route, method and status.")
+metrics.describe('lightcomics_http_request_duration_seconds', 'histogram',
+                 "Time until the response headers are ready, by route.")
+metrics.describe('lightcomics_http_response_bytes_total', 'counter', "Response body bytes by route.")
+metrics.describe('lightcomics_archive_opens_total', 'counter', "Archives opened (central directory parsed).")
+metrics.describe('lightcomics_decompress_seconds_total', 'counter', "Time spent reading archive members for pages.")
+metrics.describe('lightcomics_probe_seconds_total', 'counter', "Time spent probing image dimensions.")
+metrics.describe('lightcomics_cache_requests_total', 'counter', "Cache lookups by cache and result (hit/miss).")
+metrics.describe('lightcomics_volume_rejected_total', 'counter',
+                 "Requests rejected with 503 by volume and reason (queue_full/timeout).")
+
+
+# read 시간을 카운터(name)에 더하는 파일 객체
+class TimedReader:
+    def __init__(self, f, name):
+        self.f = f
+        self.name = name
+
+    def read(self, size=-1):
+        start = time.perf_counter()
+        data = self.f.read(size)
+        metrics.inc(self.name, time.perf_counter() - start)
+        return data
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# 모델 기반 클래스 (__slots__ 에 선언된 필드를 그대로 JSON 키로 사용한다)
+class BaseModel:
+    __slots__ = ()
+    _fields = ()
+
+    def to_json(self):
+        return {field: getattr(self, field) for field in self._fields}
+
+
+def model_to_json(o):
+    """ json.dumps 의 default 함수 """
+    return o.to_json()
 
 
 # Identifier 모델
-class BaseIdentifierModel(LightEncoder):
+class BaseIdentifierModel(BaseModel):
+    __slots__ = ('_path', '_identifier')
+    _fields = __slots__
+
     def __init__(self):
         self._path = ""
         self._identifier = ""
 
 
 # 이미지 모델
-class BaseImageModel(LightEncoder):
+class BaseImageModel(BaseModel):
+    __slots__ = ('_name', '_decode_name', '_width', '_height')
+    _fields = __slots__
+
     def __init__(self):
         self._name = ""
         self._decode_name = ""
@@ -141,8 +399,38 @@ class BaseImageModel(LightEncoder):
         self._height = -1
 
 
+# 검색 결과 모델
+class BaseSearchResultModel(BaseModel):
+    __slots__ = ('_path', '_name', '_type', '_score')
+    _fields = __slots__
+
+    def __init__(self):
+        self._path = ""
+        self._name = ""
+        self._type = ""
+        self._score = 0.0
+
+
+# 프로파일 모델
+class BaseProfileModel(BaseModel):
+    __slots__ = ('_file', '_time', '_method', '_path', '_status', '_duration_ms', '_functions')
+    _fields = __slots__
+
+    def __init__(self):
+        self._file = ""
+        self._time = 0
+        self._method = ""
+        self._path = ""
+        self._status = 0
+        self._duration_ms = 0.0
+        self._functions = []
+
+
 # 리스팅 모델
-class BaseListingModel(LightEncoder):
+class BaseListingModel(BaseModel):
+    __slots__ = ('_root', '_directories', '_archives', '_images')
+    _fields = __slots__
+
     def __init__(self):
         self._root = CONF_ROOT_PATH
         self._directories = []
@@ -150,18 +438,56 @@ class BaseListingModel(LightEncoder):
         self._images = []
 
 
+# 페이지 리스팅 모델
+class BasePagedListingModel(BaseListingModel):
+    __slots__ = ('_offset', '_limit', '_total')
+    _fields = BaseListingModel._fields + __slots__
+
+    def __init__(self):
+        super().__init__()
+        self._offset = 0
+        self._limit = 0
+        self._total = 0
+
+
 # 함수
-def fix_str(str):
-    """ 깨진 문자열을 복원하여 반환한다 """
-    name = str
+# 감지 결과를 상위 호환 인코딩으로 바꾼다 (EUC-KR로 감지된 이름에 CP949 확장 문자가 섞여 있는 경우 등)
+CHARSET_SUPERSETS = {
+    'ascii': 'utf-8',
+    'euc-kr': 'cp949',
+    'gb2312': 'gb18030',
+    'gbk': 'gb18030',
+    'shift_jis': 'cp932',
+    'euc-jp': 'euc_jis_2004',
+}
+
+CHARSET_MIN_CONFIDENCE = 0.5
+
+
+def detect_names_encoding(raw_names):
+    """ 파일 이름 바이트 목록(raw_names)을 한 번에 감지하여 인코딩을 반환한다. 알 수 없으면 None을 반환한다. """
+    joined = b"\n".join(raw_names)
     try:
-        name = name.encode('cp437').decode('cp949')
+        joined.decode('utf-8')
+        return 'utf-8'
     except UnicodeDecodeError:
-        name = name.encode('utf8')
-        encoding = chardet.detect(name)['encoding']
-        name = name.decode(encoding)
+        pass
+
+    result = chardet.detect(joined)
+    candidates = []
+    if result['encoding'] and result['confidence'] >= CHARSET_MIN_CONFIDENCE:
+        encoding = result['encoding'].lower()
+        candidates.append(CHARSET_SUPERSETS.get(encoding, encoding))
+    # 감지에 실패하면 기존처럼 cp949로 시도한다
+    candidates.append('cp949')
 
-    return name
+    for encoding in candidates:
+        try:
+            joined.decode(encoding)
+            return encoding
+        except (UnicodeDecodeError, LookupError):
+            pass
+    return None
 
 
 def get_image_size_from_bytes(head):
@@ -175,6 +501,110 @@ def get_image_size_from_bytes(head):
         return 0, 0
 
 
+# 이미지 헤더 판독기
+class ImageHeaderReader:
+    def __init__(self, f):
+        self.f = f
+        self.buffer = bytearray()
+
+    def get(self, offset, length):
+        """ offset 위치부터 length 바이트를 반환한다. 필요한 만큼만 스트림에서 읽는다. """
+        end = offset + length
+        while len(self.buffer) < end:
+            chunk = self.f.read(max(end - len(self.buffer), 512))
+            if not chunk:
+                raise ValueError("unexpected end of image header")
+            self.buffer += chunk
+        return bytes(self.buffer[offset:end])
+
+    def unpack(self, fmt, offset):
+        return struct.unpack(fmt, self.get(offset, struct.calcsize(fmt)))
+
+
+def get_jpeg_size(reader):
+    """ JPEG 헤더에서 SOF 마커를 찾아 사이즈를 반환한다 """
+    offset = 2
+    while True:
+        if reader.get(offset, 1) != b'\xff':
+            raise ValueError("invalid jpeg marker")
+        marker = reader.get(offset + 1, 1)[0]
+        if marker == 0xff:
+            offset += 1
+            continue
+        if marker == 0x01 or 0xd0 <= marker <= 0xd9:
+            offset += 2
+            continue
+        if 0xc0 <= marker <= 0xcf and marker not in (0xc4, 0xc8, 0xcc):
+            height, width = reader.unpack('>HH', offset + 5)
+            return width, height
+        offset += 2 + reader.unpack('>H', offset + 2)[0]
+
+
+def get_tiff_size(reader):
+    """ TIFF 헤더의 첫번째 IFD에서 사이즈를 반환한다 """
+    byte_order = '<' if reader.get(0, 2) == b'II' else '>'
+    ifd_offset = reader.unpack(byte_order + 'I', 4)[0]
+    entry_count = reader.unpack(byte_order + 'H', ifd_offset)[0]
+    size = {}
+    for i in range(entry_count):
+        entry_offset = ifd_offset + 2 + i * 12
+        tag, field_type = reader.unpack(byte_order + 'HH', entry_offset)
+        if tag not in (256, 257):
+            continue
+        if field_type == 3:
+            size[tag] = reader.unpack(byte_order + 'H', entry_offset + 8)[0]
+        else:
+            size[tag] = reader.unpack(byte_order + 'I', entry_offset + 8)[0]
+        if len(size) == 2:
+            return size[256], size[257]
+    raise ValueError("tiff size tag not found")
+
+
+def get_image_size_from_header(reader):
+    """ 이미지 헤더만 읽어 사이즈를 반환한다. 지원하지 않는 형식이면 None을 반환한다. """
+    signature = reader.get(0, 4)
+    if signature[:2] == b'\xff\xd8':
+        return get_jpeg_size(reader)
+    if signature == b'\x89PNG':
+        return reader.unpack('>II', 16)
+    if signature[:3] == b'GIF':
+        return reader.unpack('<HH', 6)
+    if signature[:2] == b'BM':
+        if reader.unpack('<I', 14)[0] == 12:
+            return reader.unpack('<HH', 18)
+        width, height = reader.unpack('<ii', 18)
+        return width, abs(height)
+    if signature in (b'II*\x00', b'MM\x00*'):
+        return get_tiff_size(reader)
+    return None
+
+
+def get_image_size_from_data(data):
+    """ 이미지 데이터(bytes)의 사이즈를 반환한다 (프로세스 풀에서 실행된다) """
+    return get_image_size_from_bytes(BytesIO(data))
+
+
+def get_image_size_from_stream(f, fallback=None):
+    """ 스트림(f)에서 헤더만 읽어 이미지 사이즈를 반환한다. 판독할 수 없으면 fallback(기본값 Pillow)으로 처리한다. """
+    start = time.perf_counter()
+    try:
+        reader = ImageHeaderReader(f)
+        try:
+            size = get_image_size_from_header(reader)
+            if size is not None:
+                return size
+        except (ValueError, struct.error):
+            pass
+
+        data = BytesIO()
+        data.write(reader.buffer)
+        data.write(f.read())
+        data.seek(0)
+        return (fallback or get_image_size_from_bytes)(data)
+    finally:
+        metrics.inc('lightcomics_probe_seconds_total', time.perf_counter() - start)
+
+
 def is_hidden_or_trash(full_path):
     """ 숨김 파일 또는 __MACOSX 디렉토리인지 확인한다. """
     if 'DS_STORE' in full_path:
@@ -197,6 +627,12 @@ def get_extension(file_name):
     return extension
 
 
+def natural_sort_key(name):
+    """ 숫자 부분은 숫자 크기로 비교하는 정렬 키를 반환한다 """
+    parts = re.split(r'(\d+)', name)
+    return [int(part) if i % 2 else part.casefold() for i, part in enumerate(parts)], name
+
+
 def is_extensions_allow_image(file_name):
     """ 허용된 이미지 확장자인 경우 True를 반환한다 """
     extension = get_extension(file_name)
@@ -215,151 +651,1509 @@ def is_extensions_allow_archive(file_name):
         return True
 
 
+def is_extensions_allow_rar(file_name):
+    """ RAR 압축파일 확장자인 경우 True를 반환한다 """
+    extension = get_extension(file_name)
+    return extension.upper() in ['RAR', 'CBR']
+
+
+def get_archive_identity(archive_path):
+    """ 압축파일의 식별정보(경로, 크기, 수정시간)를 반환한다 """
+    stat = os.stat(archive_path)
+    return archive_path, stat.st_size, stat.st_mtime_ns
+
+
+# 압축파일 핸들
+class ArchiveHandle:
+    def __init__(self, archive_path, identity):
+        self.path = archive_path
+        self.identity = identity
+        self.lock = threading.Lock()
+
+        self.solid = False
+        if is_extensions_allow_rar(archive_path):
+            self.archive = rarfile.RarFile(archive_path)
+            # solid RAR은 멤버마다 처음부터 압축을 풀어야 하므로 한 번에 풀어 추출 캐시에서 읽는다
+            self.solid = self.archive.is_solid()
+        else:
+            self.archive = zipfile.ZipFile(archive_path)
+        self.extract_lock = threading.Lock()
+        # 한 번 풀기를 시도한 뒤(성공, 실패 모두)에는 캐시에 없는 멤버를 직접 읽는다
+        self.extract_done = False
+
+        # 멤버 이름 -> info (namelist 순서 유지)
+        self.members = OrderedDict()
+        self.stored_offsets = {}
+        self.image_names = None
+        self.image_indexes = None
+        self.name_encoding = None
+        self.decoded_names = None
+        for info in self.archive.infolist():
+            self.members[info.filename] = info
+
+    def open_member(self, name):
+        """ 멤버(name)의 파일 객체를 반환한다. 멤버가 없으면 None을 반환한다. """
+        info = self.members.get(name)
+        if info is None:
+            return None
+        with self.lock:
+            return self.archive.open(info)
+
+    def get_image_names(self):
+        """ 이미지 멤버 이름을 namelist 순서대로 반환한다 """
+        if self.image_names is None:
+            self.image_names = [name for name in self.members
+                                if not is_hidden_or_trash(name)
+                                and is_extensions_allow_image(name)]
+            self.image_indexes = {name: i for i, name in enumerate(self.image_names)}
+        return self.image_names
+
+    def get_image_index(self, name):
+        """ 이미지 멤버(name)의 순서를 반환한다. 이미지 멤버가 아니면 None을 반환한다. """
+        self.get_image_names()
+        return self.image_indexes.get(name)
+
+    def get_raw_name(self, info):
+        """ 멤버(info)의 이름이 UTF-8로 기록되지 않았으면 원래 바이트를 반환한다. UTF-8이면 None을 반환한다. """
+        if isinstance(info, zipfile.ZipInfo):
+            # zipfile은 UTF-8 플래그(0x800)가 없는 이름을 cp437로 읽는다
+            if info.flag_bits & 0x800:
+                return None
+            try:
+                return info.filename.encode('cp437')
+            except UnicodeEncodeError:
+                return None
+
+        # RAR5와 유니코드 플래그가 있는 RAR3 이름은 이미 올바르게 읽혀 있다
+        if (isinstance(info, rarfile.Rar3Info)
+                and not info.flags & rarfile.RAR_FILE_UNICODE
+                and isinstance(info.orig_filename, bytes)):
+            return info.orig_filename
+        return None
+
+    def get_decoded_names(self):
+        """ 멤버 이름 -> 복원된 이름을 반환한다. 인코딩은 압축파일마다 한 번만 감지한다. """
+        if self.decoded_names is None:
+            raw_names = {}
+            for name, info in self.members.items():
+                raw_name = self.get_raw_name(info)
+                if raw_name is not None and not raw_name.isascii():
+                    raw_names[name] = raw_name
+
+            decoded_names = {name: name for name in self.members}
+            encoding = detect_names_encoding(raw_names.values()) if raw_names else None
+            if encoding is not None:
+                for name, raw_name in raw_names.items():
+                    decoded_names[name] = raw_name.decode(encoding).replace("\\", "/")
+            self.name_encoding = encoding
+            self.decoded_names = decoded_names
+        return self.decoded_names
+
+    def get_stored_offset(self, name):
+        """ 무압축(STORED) zip 멤버(name)의 데이터 시작 위치를 반환한다. 해당하지 않으면 None을 반환한다. """
+        info = self.members.get(name)
+        if (not isinstance(info, zipfile.ZipInfo)
+                or info.compress_type != zipfile.ZIP_STORED
+                or info.flag_bits & 0x1):
+            return None
+
+        offset = self.stored_offsets.get(name)
+        if offset is None:
+            with open(self.path, mode='rb') as fp:
+                fp.seek(info.header_offset)
+                header = fp.read(zipfile.sizeFileHeader)
+            if len(header) != zipfile.sizeFileHeader or header[:4] != zipfile.stringFileHeader:
+                return None
+            fields = struct.unpack(zipfile.structFileHeader, header)
+            offset = (info.header_offset + zipfile.sizeFileHeader
+                      + fields[zipfile._FH_FILENAME_LENGTH]
+                      + fields[zipfile._FH_EXTRA_FIELD_LENGTH])
+            self.stored_offsets[name] = offset
+        return offset
+
+    def close(self):
+        with self.lock:
+            self.archive.close()
+
+    def __del__(self):
+        # 캐시에서 빠진 핸들은 다른 스레드가 아직 읽고 있을 수 있으므로 마지막 참조가 사라질 때 닫는다
+        archive = getattr(self, 'archive', None)
+        if archive is not None:
+            archive.close()
+
+
+# 압축파일 핸들 캐시 (LRU, 빠진 핸들은 닫지 않고 참조만 놓는다)
+class ArchiveCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._handles = OrderedDict()
+
+    def get(self, archive_path):
+        """ 압축파일(archive_path)의 핸들을 반환한다. 파일이 변경되었으면 다시 연다. """
+        identity = get_archive_identity(archive_path)
+
+        with self._lock:
+            handle = self._handles.get(archive_path)
+            if handle is not None and handle.identity == identity:
+                self._handles.move_to_end(archive_path)
+                metrics.inc_cache('archive', True)
+                return handle
+
+        # 중앙 디렉토리 파싱은 느릴 수 있으므로 잠금 밖에서 연다
+        metrics.inc_cache('archive', False)
+        metrics.inc('lightcomics_archive_opens_total')
+        new_handle = ArchiveHandle(archive_path, identity)
+
+        with self._lock:
+            handle = self._handles.get(archive_path)
+            if handle is not None and handle.identity == identity:
+                self._handles.move_to_end(archive_path)
+            else:
+                handle = new_handle
+                self._handles[archive_path] = handle
+            while len(self._handles) > max(self.max_size, 1):
+                self._handles.popitem(last=False)
+
+        return handle
+
+    def clear(self):
+        with self._lock:
+            self._handles.clear()
+
+
+archive_cache = ArchiveCache(CONF_ARCHIVE_CACHE_SIZE)
+
+
+# 이미지 크기 인덱스 (SQLite)
+class DimensionIndex:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=30,
+                                         check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS dimensions ("
+                " archive_path TEXT NOT NULL,"
+                " archive_size INTEGER NOT NULL,"
+                " archive_mtime INTEGER NOT NULL,"
+                " member TEXT NOT NULL,"
+                " crc INTEGER,"
+                " width INTEGER NOT NULL,"
+                " height INTEGER NOT NULL,"
+                " PRIMARY KEY (archive_path, member))")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, identity):
+        """ 압축파일(identity)의 멤버별 (crc, width, height)를 반환한다. 변경된 압축파일의 항목은 삭제한다. """
+        path, size, mtime = identity
+        with self._lock:
+            conn = self._connect()
+            cursor = conn.execute(
+                "DELETE FROM dimensions WHERE archive_path = ?"
+                " AND (archive_size != ? OR archive_mtime != ?)",
+                (path, size, mtime))
+            if cursor.rowcount:
+                conn.commit()
+            rows = conn.execute(
+                "SELECT member, crc, width, height FROM dimensions"
+                " WHERE archive_path = ?", (path,)).fetchall()
+        return {row[0]: (row[1], row[2], row[3]) for row in rows}
+
+    def put(self, identity, entries):
+        """ 압축파일(identity)의 멤버별 크기 [(member, crc, width, height), ...]를 저장한다. """
+        if not entries:
+            return
+        path, size, mtime = identity
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO dimensions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(path, size, mtime) + tuple(entry) for entry in entries])
+            conn.commit()
+
+
+dimension_index = DimensionIndex(os.path.join(CONF_CACHE_PATH, "lightcomics.db"))
+
+
+def get_cached_dimension(dimensions, name, crc):
+    """ 인덱스(dimensions)에 저장된 멤버(name)의 크기를 반환한다. 없거나 CRC가 다르면 None을 반환한다. """
+    cached = dimensions.get(name)
+    if cached is None or cached[0] != crc:
+        metrics.inc_cache('dimension', False)
+        return None
+    metrics.inc_cache('dimension', True)
+    return cached[1], cached[2]
+
+
+# 디스크 캐시 (내용 주소 기반, 전체 크기 제한, LRU)
+class DiskCache:
+    def __init__(self, cache_path, max_bytes):
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    @staticmethod
+    def make_key(*parts):
+        """ parts로부터 캐시 키를 생성하여 반환한다 """
+        return make_etag(*parts)
+
+    def get_file_path(self, key):
+        """ 키(key)에 해당하는 캐시 파일 경로를 반환한다 """
+        return os.path.join(self.cache_path, key[:2], key)
+
+    def get(self, key):
+        """ 키(key)에 해당하는 캐시 파일 경로를 반환한다. 없으면 None을 반환한다. """
+        file_path = self.get_file_path(key)
+        try:
+            os.utime(file_path)
+        except OSError:
+            return None
+        return file_path
+
+    def get_temp_path(self, key):
+        """ 키(key)의 파일을 작성할 임시 파일 경로를 반환한다 (캐시와 같은 파일시스템) """
+        file_path = self.get_file_path(key)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        return "%s.%d.%d.tmp" % (file_path, os.getpid(), threading.get_ident())
+
+    def put(self, key, data):
+        """ 데이터(data)를 키(key)로 저장하고 캐시 파일 경로를 반환한다 """
+        temp_path = self.get_temp_path(key)
+        with open(temp_path, mode='wb') as f:
+            f.write(data)
+        return self.put_file(key, temp_path)
+
+    def put_file(self, key, temp_path):
+        """ get_temp_path로 작성한 파일(temp_path)을 키(key)로 저장하고 캐시 파일 경로를 반환한다 """
+        file_path = self.get_file_path(key)
+        size = os.path.getsize(temp_path)
+        os.replace(temp_path, file_path)
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_total_bytes()
+            else:
+                self._total_bytes += size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+        return file_path
+
+    def _iter_files(self):
+        for dir_entry in os.scandir(self.cache_path) if os.path.isdir(self.cache_path) else []:
+            if not dir_entry.is_dir():
+                continue
+            for entry in os.scandir(dir_entry.path):
+                if entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    yield entry.path, entry.stat()
+                except OSError:
+                    continue
+
+    def _scan_total_bytes(self):
+        return sum(stat.st_size for _, stat in self._iter_files())
+
+    def _evict(self):
+        """ 오래 사용하지 않은 파일부터 삭제하여 전체 크기를 제한의 90% 이하로 줄인다 """
+        files = sorted(self._iter_files(), key=lambda item: item[1].st_mtime)
+        total_bytes = sum(stat.st_size for _, stat in files)
+        for file_path, stat in files:
+            if total_bytes <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(file_path)
+                total_bytes -= stat.st_size
+            except OSError:
+                pass
+        self._total_bytes = total_bytes
+
+
+transcode_cache = DiskCache(os.path.join(CONF_CACHE_PATH, "transcode"),
+                            CONF_TRANSCODE_CACHE_SIZE * 1024 * 1024)
+extract_cache = DiskCache(os.path.join(CONF_CACHE_PATH, "extract"),
+                          CONF_EXTRACT_CACHE_SIZE * 1024 * 1024)
+cover_cache = DiskCache(os.path.join(CONF_CACHE_PATH, "covers"),
+                        CONF_COVER_CACHE_SIZE * 1024 * 1024)
+
+
+def extract_solid_archive(handle):
+    """ solid 압축파일 핸들(handle)의 이미지를 한 번의 순차 해제로 풀어 추출 캐시에 저장한다 """
+    # 파일 인자 없이 출력 명령을 실행하면 모든 멤버가 압축파일 순서대로 이어서 출력된다
+    cmdline = rarfile.tool_setup().open_cmdline(None, handle.path)
+    proc = rarfile.custom_popen(cmdline)
+    stdout = TimedReader(proc.stdout, 'lightcomics_decompress_seconds_total')
+    try:
+        for name, info in handle.members.items():
+            if info.is_dir():
+                continue
+            if is_hidden_or_trash(name) or not is_extensions_allow_image(name):
+                skip_stream(stdout, info.file_size)
+                continue
+
+            key = extract_cache.make_key(handle.identity, name)
+            temp_path = extract_cache.get_temp_path(key)
+            crc = 0
+            remaining = info.file_size
+            try:
+                with open(temp_path, mode='wb') as f:
+                    while remaining > 0:
+                        chunk = stdout.read(min(CONF_STREAM_CHUNK_SIZE, remaining))
+                        if not chunk:
+                            break
+                        crc = zlib.crc32(chunk, crc)
+                        remaining -= len(chunk)
+                        f.write(chunk)
+                if remaining > 0 or crc != info.CRC:
+                    raise rarfile.BadRarFile("Extracted data mismatch: %s" % name)
+                extract_cache.put_file(key, temp_path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+    finally:
+        proc.stdout.close()
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+
+
+def get_extracted_member_path(handle, name):
+    """ solid 압축파일 핸들(handle)의 이미지(name)가 풀린 캐시 파일 경로를 반환한다. 없으면 None을 반환한다. """
+    if not handle.solid or name not in handle.members:
+        return None
+
+    key = extract_cache.make_key(handle.identity, name)
+    file_path = extract_cache.get(key)
+    metrics.inc_cache('extract', file_path is not None)
+    if file_path is not None or handle.extract_done:
+        # 풀어둔 페이지가 캐시에서 밀려났으면 압축파일 전체를 다시 풀지 않고 멤버를 직접 읽게 한다
+        return file_path
+
+    # 같은 압축파일을 동시에 여러 번 풀지 않도록 한다
+    with handle.extract_lock:
+        file_path = extract_cache.get(key)
+        if file_path is None and not handle.extract_done:
+            image_size = sum(info.file_size for member_name, info in handle.members.items()
+                             if is_extensions_allow_image(member_name))
+            # 추출 캐시보다 큰 압축파일은 풀면서 자기 페이지를 밀어내므로 풀지 않는다
+            if image_size <= extract_cache.max_bytes * 0.9:
+                try:
+                    extract_solid_archive(handle)
+                except Exception:
+                    app.logger.error("Can not extract solid archive >> " + handle.path)
+                file_path = extract_cache.get(key)
+            handle.extract_done = True
+    return file_path
+
+
+# 메모리 캐시 (전체 바이트 크기 제한, LRU)
+class MemoryCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self._total_bytes = 0
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old_data = self._items.pop(key, None)
+            if old_data is not None:
+                self._total_bytes -= len(old_data)
+            self._items[key] = data
+            self._total_bytes += len(data)
+            while self._total_bytes > self.max_bytes:
+                self._total_bytes -= len(self._items.popitem(last=False)[1])
+
+
+page_cache = MemoryCache(CONF_PAGE_CACHE_SIZE * 1024 * 1024)
+
+
+def advise_will_need(file_path, offset, length):
+    """ 파일(file_path)의 offset부터 length 바이트를 OS 캐시에 미리 읽어두도록 요청한다 """
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    fd = os.open(file_path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, offset, length, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
+
+
+def prefetch_page(handle, name):
+    """ 압축파일 핸들(handle)의 이미지(name)를 미리 읽어 페이지 캐시에 저장한다 """
+    key = (handle.identity, name)
+    if key in page_cache:
+        return
+    # solid 압축파일의 페이지는 추출 캐시에서 바로 읽는다
+    if handle.solid:
+        return
+    try:
+        offset = handle.get_stored_offset(name)
+        if offset is not None:
+            # 무압축 멤버는 sendfile로 보내므로 페이지 캐시에 넣지 않고 OS 캐시만 채운다
+            advise_will_need(handle.path, offset, handle.members[name].file_size)
+            return
+    except OSError:
+        return
+    if handle.members[name].file_size > page_cache.max_bytes // 8:
+        return
+    try:
+        with TimedReader(handle.open_member(name), 'lightcomics_decompress_seconds_total') as f:
+            page_cache.put(key, f.read())
+    except Exception:
+        logger.debug("prefetch failed: %s %s", handle.path, name)
+
+
+# 다음 페이지 미리 읽기
+class PagePrefetcher:
+    def __init__(self, page_count):
+        self.page_count = page_count
+        self._lock = threading.Lock()
+        # (클라이언트, 압축파일 경로) -> {이미지 이름: future}
+        self._pending = {}
+
+    def schedule(self, client, handle, name):
+        """ 클라이언트(client)가 요청한 이미지(name) 다음 페이지들을 미리 읽는다. 범위를 벗어난 예약은 취소한다. """
+        if self.page_count <= 0:
+            return
+        index = handle.get_image_index(name)
+        if index is None:
+            return
+        wanted = handle.get_image_names()[index + 1:index + 1 + self.page_count]
+
+        # 같은 주소(NAT)의 다른 사용자가 읽는 압축파일의 예약은 건드리지 않는다
+        reader = (client, handle.path)
+        executor = get_volume_executor(handle.path, 'prefetch')
+        with self._lock:
+            pending = {}
+            for wanted_name, future in self._pending.pop(reader, {}).items():
+                if wanted_name in wanted and not future.done():
+                    pending[wanted_name] = future
+                else:
+                    future.cancel()
+
+            for wanted_name in wanted:
+                if wanted_name in pending or (handle.identity, wanted_name) in page_cache:
+                    continue
+                pending[wanted_name] = executor.submit(prefetch_page, handle, wanted_name)
+
+            # 예약이 모두 끝난 독자는 지운다
+            self._pending = {key: futures for key, futures in self._pending.items()
+                             if not all(future.done() for future in futures.values())}
+            if pending:
+                self._pending[reader] = pending
+
+
+page_prefetcher = PagePrefetcher(CONF_PREFETCH_PAGES)
+
+
+def get_file_stamp(stat):
+    """ 파일 크기와 수정시간으로 크기 인덱스의 crc 자리에 저장할 값을 만든다 """
+    return zlib.crc32(b"%d:%d" % (stat.st_size, stat.st_mtime_ns))
+
+
 def get_imagemodel_in_dir(dir_path, mode):
     """ 디렉토리의(dir_path)의 이미지파일의 name, width, height를 모아서 반환한다."""
     image_models = []
 
-    for name in os.listdir(dir_path):
+    # 폴더는 파일마다 따로 바뀌므로 폴더 단위 식별자는 고정하고 파일별 stamp로 크기를 검증한다
+    identity = (remove_trail_slash(dir_path), 0, 0)
+    if mode == "1":
+        dimensions = dimension_index.get(identity)
+        new_dimensions = []
+
+    for name in get_listing_entry(os.path.join(dir_path, "")).images:
+        model = BaseImageModel()
+        model._name = name
+        model._decode_name = name
+        if mode == "1":
+            file_path = os.path.join(dir_path, name)
+            stamp = get_file_stamp(os.stat(file_path))
+            size = get_cached_dimension(dimensions, name, stamp)
+            if size is None:
+                with open(file_path, mode='rb') as f:
+                    size = get_image_size_from_stream(f)
+                new_dimensions.append((name, stamp) + tuple(size))
+            model._width = size[0]
+            model._height = size[1]
+
+        image_models.append(model)
+
+    if mode == "1":
+        dimension_index.put(identity, new_dimensions)
+
+    return image_models
+
+
+# 크기 작업 스레드 전용 압축파일 핸들 (공유 핸들의 잠금을 기다리지 않도록 한다)
+DIMENSION_WORKER_HANDLES = 4
+dimension_worker_local = threading.local()
+
+
+def get_worker_handle(shared_handle):
+    """ 현재 작업 스레드의 압축파일(shared_handle) 핸들을 반환한다 """
+    handles = getattr(dimension_worker_local, 'handles', None)
+    if handles is None:
+        handles = dimension_worker_local.handles = OrderedDict()
+
+    handle = handles.get(shared_handle.path)
+    if handle is not None and handle.identity == shared_handle.identity:
+        handles.move_to_end(shared_handle.path)
+        return handle
+    if handle is not None:
+        handle.close()
+
+    handle = handles[shared_handle.path] = ArchiveHandle(shared_handle.path, shared_handle.identity)
+    while len(handles) > DIMENSION_WORKER_HANDLES:
+        handles.popitem(last=False)[1].close()
+    return handle
+
+
+# 백그라운드 작업 스레드 풀 (볼륨마다 따로 두어 느린 디스크의 작업이 다른 볼륨의 작업을 막지 않게 한다)
+def get_background_workers(kind):
+    """ 작업 종류(kind)의 스레드 수를 반환한다 """
+    return {'dimension': CONF_DIMENSION_WORKERS,
+            'prefetch': CONF_PREFETCH_WORKERS,
+            'cover': CONF_COVER_WORKERS,
+            'stream': CONF_VOLUME_WORKERS}[kind]
+
+
+class BackgroundExecutors:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executors = {}
+
+    def get(self, kind):
+        """ 작업 종류(kind)의 스레드 풀을 반환한다. 처음 쓸 때 만든다. """
+        with self._lock:
+            executor = self._executors.get(kind)
+            if executor is None:
+                executor = self._executors[kind] = ThreadPoolExecutor(
+                    max_workers=max(get_background_workers(kind), 1), thread_name_prefix=kind)
+            return executor
+
+    def shutdown(self):
+        with self._lock:
+            executors = list(self._executors.values())
+        for executor in executors:
+            executor.shutdown(wait=False)
+
+
+# 볼륨이 없을 때 쓰는 공용 스레드 풀
+default_executors = BackgroundExecutors()
+
+
+def get_volume_executor(path, kind):
+    """ 경로(path)를 담당하는 볼륨의 작업(kind) 스레드 풀을 반환한다. 볼륨이 없으면 공용 스레드 풀을 반환한다. """
+    pool = volume_dispatcher.get_path_pool(path)
+    executors = pool.executors if pool is not None else default_executors
+    return executors.get(kind)
+
+
+dimension_process_pool = None
+dimension_process_pool_lock = threading.Lock()
+
+
+def get_image_size_in_process(data):
+    """ Pillow 처리를 프로세스 풀에서 실행하여 이미지(data) 사이즈를 반환한다 (리눅스, DIMENSION_PROCESSES) """
+    global dimension_process_pool
+    if CONF_DIMENSION_PROCESSES <= 0 or not IS_OS_LINUX:
+        return get_image_size_from_bytes(data)
+
+    with dimension_process_pool_lock:
+        if dimension_process_pool is None:
+            dimension_process_pool = ProcessPoolExecutor(
+                max_workers=CONF_DIMENSION_PROCESSES,
+                mp_context=multiprocessing.get_context('fork'))
+    return dimension_process_pool.submit(get_image_size_from_data, data.getvalue()).result()
+
 
+def probe_archive_member(shared_handle, name):
+    """ 압축파일 핸들(shared_handle)의 이미지(name) 사이즈를 작업 스레드에서 구한다 """
+    if shared_handle.solid:
+        # solid 압축파일은 공유 핸들로 한 번만 풀고 추출 캐시에서 읽는다
+        file_path = get_extracted_member_path(shared_handle, name)
+        if file_path is not None:
+            with open(file_path, mode='rb') as f:
+                return get_image_size_from_stream(f, get_image_size_in_process)
+
+    handle = get_worker_handle(shared_handle)
+    with handle.open_member(name) as f:
+        return get_image_size_from_stream(f, get_image_size_in_process)
+
+
+def iter_imagemodel_in_archive(archive_path, mode):
+    """ 압축파일(archive_path)의 이미지 모델을 순서대로 반환한다. mode 1의 크기는 작업 스레드에서 병렬로 구한다. """
+    handle = archive_cache.get(archive_path)
+    decoded_names = handle.get_decoded_names()
+    # RAR은 크기를 구할 수 없는 이미지가 있어도 목록을 반환한다
+    tolerant = is_extensions_allow_rar(archive_path)
+
+    image_models = []
+    for name in handle.members:
+        if is_hidden_or_trash(name):
+            continue
         if is_extensions_allow_image(name):
             model = BaseImageModel()
-            model._name = os.path.join(dir_path, name).replace("\\", "/")
-            if mode == "1":
-                with open(model._name, mode='rb') as f:
-                    data = BytesIO()
-                    data.write(f.read())
-                    data.seek(0)
-                    size = get_image_size_from_bytes(data)
-                    model._width = size[0]
-                    model._height = size[1]
-
+            model._name = name
+            model._decode_name = decoded_names[name]
             image_models.append(model)
 
-    return image_models
+    if mode != "1":
+        yield from image_models
+        return
 
+    dimensions = dimension_index.get(handle.identity)
+    sizes = [get_cached_dimension(dimensions, model._name, handle.members[model._name].CRC)
+             for model in image_models]
+    missing = deque(i for i, size in enumerate(sizes) if size is None)
+    # 한 요청이 공유 작업 큐를 독차지하지 않도록 동시에 맡기는 작업 수를 제한하고 결과가 나오는 대로 채운다
+    window = 2 * max(CONF_DIMENSION_WORKERS, 1)
+    executor = get_volume_executor(archive_path, 'dimension')
+    futures = {}
 
-def get_imagemodel_in_zip(zip_path, mode):
-    """ 압축파일(zip_path)의 이미지파일의 name, width, height를 모아서 반환한다."""
-    image_models = []
+    new_dimensions = []
+    try:
+        for i, model in enumerate(image_models):
+            while missing and len(futures) < window:
+                index = missing.popleft()
+                futures[index] = executor.submit(probe_archive_member, handle,
+                                                 image_models[index]._name)
+            size = sizes[i]
+            future = futures.pop(i, None)
+            if future is not None:
+                try:
+                    size = future.result()
+                    new_dimensions.append((model._name, handle.members[model._name].CRC) + tuple(size))
+                except Exception:
+                    if not tolerant:
+                        raise
+                    app.logger.error("Can not getting width, height >> " + model._name)
+                    size = None
+            if size is not None:
+                model._width = size[0]
+                model._height = size[1]
+            yield model
+    finally:
+        # 클라이언트가 연결을 끊으면 남은 작업을 취소한다
+        for future in futures.values():
+            future.cancel()
+        dimension_index.put(handle.identity, new_dimensions)
 
-    with zipfile.ZipFile(zip_path) as zf:
-        for name in zf.namelist():
-            if is_hidden_or_trash(name):
-                continue
-            if is_extensions_allow_image(name):
-                model = BaseImageModel()
-                model._name = name
-                model._decode_name = fix_str(name)
-                if mode == "1":
-                    with zf.open(name) as f:
-                        data = BytesIO()
-                        data.write(f.read())
-                        data.seek(0)
-                        size = get_image_size_from_bytes(data)
-                        model._width = size[0]
-                        model._height = size[1]
-
-                image_models.append(model)
 
-    return image_models
+def get_imagemodel_in_zip(zip_path, mode):
+    """ 압축파일(zip_path)의 이미지파일의 name, width, height를 모아서 반환한다."""
+    return list(iter_imagemodel_in_archive(zip_path, mode))
 
 
 def get_imagemodel_in_rar(rar_path, mode):
     """ 압축파일(rar_path)의 이미지파일의 name, width, height를 모아서 반환한다."""
-    image_models = []
+    return list(iter_imagemodel_in_archive(rar_path, mode))
 
-    with rarfile.RarFile(rar_path) as rf:
-        for name in rf.namelist():
-            if is_hidden_or_trash(name):
-                continue
-            if is_extensions_allow_image(name):
-                model = BaseImageModel()
-                model._name = name
-                app.logger.info("fileName: " + name)
-                if mode == "1":
-                    try:
-                        with rf.read(name) as f:
-                            data = BytesIO()
-                            data.write(f)
-                            data.seek(0)
-                            size = get_image_size_from_bytes(data)
-                            model._width = size[0]
-                            model._height = size[1]
-                    except Exception:
-                        app.logger.error("Can not getting width, height >> " + name)
-                image_models.append(model)
 
-    return image_models
+def open_image_in_dir(file_path):
+    """ 이미지 파일(file_path)의 스트림과 크기를 반환한다. """
+    if not is_extensions_allow_image(file_path) or not os.path.isfile(file_path):
+        return None
 
+    f = open(file_path, mode='rb')
+    return f, os.fstat(f.fileno()).st_size
 
-def get_image_data_in_dir(file_path):
-    """ 이미지 파일(file_path)의 데이터를 반환한다. """
-    with open(file_path, mode='rb') as f:
-        data = BytesIO()
-        data.write(f.read())
-        data.seek(0)
+
+def open_image_in_zip(zip_path, file_path):
+    """ 압축 파일(zip_path)에서 이미지 파일(file_path)의 스트림과 크기를 반환한다. """
+    if not is_extensions_allow_image(file_path):
+        return None
+
+    handle = archive_cache.get(zip_path)
+    f = handle.open_member(file_path)
+    if f is None:
+        return None
+
+    return TimedReader(f, 'lightcomics_decompress_seconds_total'), handle.members[file_path].file_size
+
+
+def open_image_in_rar(rar_path, file_path):
+    """ 압축 파일(rar_path)에서 이미지 파일(file_path)의 스트림과 크기를 반환한다. """
+    if not is_extensions_allow_image(file_path):
+        return None
+
+    handle = archive_cache.get(rar_path)
+    try:
+        # solid 압축파일은 추출 캐시에 풀린 파일이 있으면 그 파일을 연다
+        extracted_path = get_extracted_member_path(handle, file_path)
+        if extracted_path is not None:
+            f = open(extracted_path, mode='rb')
+        else:
+            f = handle.open_member(file_path)
+            if f is None:
+                return None
+            f = TimedReader(f, 'lightcomics_decompress_seconds_total')
+
+        return f, handle.members[file_path].file_size
+    except Exception:
+        app.logger.error("Canot open fileName: " + file_path)
+
+
+def run_in_volume_stream(pool, fn, *args):
+    """ 볼륨(pool)의 전송 스레드에서 fn을 실행하고 결과를 반환한다. 이미 볼륨 작업 스레드이면 바로 실행한다. """
+    if volume_local.pool is not None:
+        return fn(*args)
+    future = pool.executors.get('stream').submit(fn, *args)
+    return future.result(timeout=CONF_VOLUME_TIMEOUT or None)
+
+
+# 볼륨 작업 풀에서 만든 여러 멤버 응답의 본문을 요청 스레드 대신 볼륨 스레드에서 만든다
+class VolumeIterator:
+    def __init__(self, iterable, pool):
+        self.iterator = iter(iterable)
+        self.pool = pool
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return run_in_volume_stream(self.pool, next, self.iterator)
+
+    def close(self):
+        close = getattr(self.iterator, 'close', None)
+        if close is not None:
+            close()
+
+
+def iter_stream(f, chunk_size, length=None):
+    """ 스트림(f)을 chunk_size 단위로 length 바이트까지 읽어 반환하고, 끝나면 닫는다. """
+    try:
+        while length is None or length > 0:
+            size = chunk_size if length is None else min(chunk_size, length)
+            chunk = f.read(size)
+            if not chunk:
+                break
+            if length is not None:
+                length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def skip_stream(f, length):
+    """ 스트림(f)에서 length 바이트를 읽고 버린다. """
+    while length > 0:
+        chunk = f.read(min(CONF_STREAM_CHUNK_SIZE, length))
+        if not chunk:
+            break
+        length -= len(chunk)
+
+
+# 파일의 일부 구간만 읽는 파일 객체 (wsgi.file_wrapper 에서 sendfile 로 전송된다)
+class FileSlice:
+    def __init__(self, f, length):
+        self.f = f
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.f.read(size)
+        self.remaining -= len(data)
         return data
 
+    def fileno(self):
+        return self.f.fileno()
 
-def get_image_data_in_zip(zip_path, file_path):
-    """ 압축 파일(zip_path)에서 이미지 파일(file_path)의 데이터를 반환한다. """
-    with zipfile.ZipFile(zip_path) as zf:
-        for name in zf.namelist():
-            if name == file_path and is_extensions_allow_image(name):
-                with zf.open(name) as f:
-                    data = BytesIO()
-                    data.write(f.read())
-                    data.seek(0)
-                    return data
+    def close(self):
+        self.f.close()
 
 
-def get_image_data_in_rar(rar_path, file_path):
-    """ 압축 파일(rar_path)에서 이미지 파일(file_path)의 데이터를 반환한다. """
-    with rarfile.RarFile(rar_path) as rf:
-        for name in rf.namelist():
-            if name == file_path and is_extensions_allow_image(name):
-                try:
-                    with rf.read(name) as f:
-                        data = BytesIO()
-                        data.write(f.read())
-                        data.seek(0)
-                        return data
-                except Exception:
-                    app.logger.error("Canot open fileName: " + name)
-                    
+def get_request_range(length, etag=None):
+    """ Range 헤더를 해석하여 (start, stop)을 반환한다. 만족할 수 없는 범위이면 None을 반환한다. """
+    byte_range = request.range
+    if byte_range is None or byte_range.units != 'bytes' or len(byte_range.ranges) != 1:
+        return 0, length
+    if 'If-Range' in request.headers and (etag is None or request.if_range.etag != etag):
+        return 0, length
+    return byte_range.range_for_length(length)
+
+
+def make_range_not_satisfiable_response(length):
+    """ 416 응답을 반환한다 """
+    response = flask.Response(status=416)
+    response.headers['Content-Range'] = 'bytes */%d' % length
+    return response
+
+
+def set_image_response_headers(response, file_name, byte_range, length):
+    """ 이미지 응답에 길이, Range, 첨부파일 헤더를 설정한다 """
+    start, stop = byte_range
+    response.content_length = stop - start
+    response.headers['Accept-Ranges'] = 'bytes'
+    if stop - start != length:
+        response.status_code = 206
+        response.headers['Content-Range'] = 'bytes %d-%d/%d' % (start, stop - 1, length)
+    set_attachment_filename(response, file_name)
+
 
+def set_attachment_filename(response, file_name):
+    """ 응답(response)에 첨부파일 이름(file_name)을 설정한다. """
+    try:
+        file_name.encode('ascii')
+        names = {'filename': file_name}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', file_name)
+        simple = simple.encode('ascii', 'ignore').decode('ascii')
+        names = {'filename': simple,
+                 'filename*': "UTF-8''" + quote(file_name, safe="!#$&+^`|~")}
+    response.headers.set('Content-Disposition', 'attachment', **names)
+
+
+mimetypes.add_type('application/vnd.comicbook+zip', '.cbz')
+mimetypes.add_type('application/vnd.comicbook-rar', '.cbr')
+
+
+def get_mimetype(file_name):
+    """ 파일 이름(file_name)의 mimetype을 반환한다 """
+    return mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+
+
+def make_image_stream_response(f, length, file_name, etag=None):
+    """ 스트림(f)을 청크 단위로 전송하는 이미지 응답을 반환한다. """
+    byte_range = get_request_range(length, etag)
+    if byte_range is None:
+        f.close()
+        return make_range_not_satisfiable_response(length)
+
+    start, stop = byte_range
+    skip_stream(f, start)
+    response = flask.Response(iter_stream(f, CONF_STREAM_CHUNK_SIZE, stop - start),
+                              mimetype=get_mimetype(file_name),
+                              direct_passthrough=True)
+    set_image_response_headers(response, file_name, byte_range, length)
+    return response
+
+
+# 전송 속도 제한 (토큰 버킷)
+class TokenBucket:
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.timestamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount):
+        """ amount 바이트를 보낼 수 있을 때까지 기다린다 """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.timestamp) * self.rate)
+            self.timestamp = now
+            # 토큰이 부족하면 미리 차감하고 부족한 만큼 기다린다 (요청 순서대로 공평하게 나뉜다)
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+# 전체 다운로드 속도 제한 (운영 서버에서는 워커 프로세스마다 나눠 갖는다)
+download_bucket = TokenBucket(CONF_DOWNLOAD_TOTAL_RATE_LIMIT * 1024) \
+    if CONF_DOWNLOAD_TOTAL_RATE_LIMIT > 0 else None
 
-def get_listing_model(path):
-    """ 리스팅 """
-    listing_model = BaseListingModel()
 
-    for name in os.listdir(path):
-        full_path = os.path.join(path, name).replace("\\", "/")
+def share_download_bucket(workers):
+    """ 전체 다운로드 속도 제한을 워커 프로세스(workers) 수로 나눈다. 워커를 만들기 전에 호출한다. """
+    global download_bucket
+    if CONF_DOWNLOAD_TOTAL_RATE_LIMIT > 0:
+        download_bucket = TokenBucket(CONF_DOWNLOAD_TOTAL_RATE_LIMIT * 1024 / max(workers, 1))
+
+
+def get_download_buckets():
+    """ 다운로드 응답에 적용할 토큰 버킷 목록을 반환한다 """
+    buckets = []
+    if CONF_DOWNLOAD_RATE_LIMIT > 0:
+        buckets.append(TokenBucket(CONF_DOWNLOAD_RATE_LIMIT * 1024))
+    if download_bucket is not None:
+        buckets.append(download_bucket)
+    return buckets
+
+
+def iter_throttled(f, chunk_size, buckets):
+    """ 스트림(f)을 토큰 버킷(buckets)의 속도에 맞춰 chunk_size 단위로 반환하고, 끝나면 닫는다. """
+    try:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            for bucket in buckets:
+                bucket.consume(len(chunk))
+            yield chunk
+    finally:
+        f.close()
+
+
+def make_file_range_response(file_path, offset, length, file_name, etag=None,
+                             buckets=None):
+    """ 파일(file_path)의 offset부터 length 바이트 구간을 그대로 전송하는 응답을 반환한다. """
+    byte_range = get_request_range(length, etag)
+    if byte_range is None:
+        return make_range_not_satisfiable_response(length)
+
+    start, stop = byte_range
+    f = open(file_path, mode='rb')
+    f.seek(offset + start)
+    if buckets:
+        # 속도 제한이 있으면 sendfile 대신 청크 단위로 나눠 보낸다
+        body = iter_throttled(FileSlice(f, stop - start), CONF_STREAM_CHUNK_SIZE, buckets)
+    else:
+        body = wrap_file(request.environ, FileSlice(f, stop - start),
+                         CONF_STREAM_CHUNK_SIZE)
+    response = flask.Response(body,
+                              mimetype=get_mimetype(file_name),
+                              direct_passthrough=True)
+    set_image_response_headers(response, file_name, byte_range, length)
+    return response
 
-        if os.path.isdir(full_path):
-            listing_model._directories.append(full_path)
 
-        elif is_extensions_allow_archive(full_path):
-            listing_model._archives.append(full_path)
+def open_image_in_archive(archive_path, img_path):
+    """ 압축파일(archive_path)에서 이미지(img_path)의 스트림과 크기를 반환한다. """
+    if is_extensions_allow_rar(archive_path):
+        return open_image_in_rar(archive_path, img_path)
+    return open_image_in_zip(archive_path, img_path)
 
-        elif is_extensions_allow_image(full_path):
-            listing_model._images.append(full_path)
 
+def make_archive_page_response(archive_path, img_path, etag=None):
+    """ 압축파일(archive_path)의 이미지(img_path) 응답을 반환한다. 이미지가 없으면 None을 반환한다. """
+    file_name = os.path.basename(img_path)
+    handle = archive_cache.get(archive_path)
+
+    data = page_cache.get((handle.identity, img_path))
+    metrics.inc_cache('page', data is not None)
+    if data is not None:
+        return make_image_stream_response(BytesIO(data), len(data), file_name, etag)
+
+    if not is_extensions_allow_rar(archive_path) and is_extensions_allow_image(img_path):
+        offset = handle.get_stored_offset(img_path)
+        if offset is not None:
+            return make_file_range_response(archive_path, offset,
+                                            handle.members[img_path].file_size,
+                                            file_name, etag)
+
+    if handle.solid and is_extensions_allow_image(img_path):
+        file_path = get_extracted_member_path(handle, img_path)
+        if file_path is not None:
+            return make_file_range_response(file_path, 0, handle.members[img_path].file_size,
+                                            file_name, etag)
+
+    img = open_image_in_archive(archive_path, img_path)
+    if img is None:
+        return None
+
+    return make_image_stream_response(img[0], img[1], file_name, etag)
+
+
+def get_batch_names(handle):
+    """ 요청의 name 목록 또는 start, count 범위에 해당하는 이미지 이름을 압축파일 내 위치 순서로 반환한다. 잘못된 요청이면 ValueError를 발생시킨다. """
+    image_names = handle.get_image_names()
+    names = request.args.getlist('name')
+    if names:
+        names = [unquote(name) for name in names]
+    else:
+        start = request.args.get('start', 0, type=int)
+        count = request.args.get('count', CONF_BATCH_MAX_PAGES, type=int)
+        if start < 0 or count < 0:
+            raise ValueError("invalid range")
+        names = image_names[start:start + min(count, CONF_BATCH_MAX_PAGES)]
+
+    if len(names) > CONF_BATCH_MAX_PAGES:
+        raise ValueError("too many pages")
+
+    # 요청에 없는 멤버, 이미지가 아닌 멤버는 제외하고 중복을 제거한다
+    names = [name for name in OrderedDict.fromkeys(names)
+             if handle.get_image_index(name) is not None]
+    # 압축파일을 앞에서부터 한 번만 읽도록 멤버 헤더 위치 순서로 정렬한다
+    return sorted(names, key=lambda name: handle.members[name].header_offset)
+
+
+def make_batch_part_header(boundary, name, length, mimetype=None):
+    """ multipart 응답의 파트 헤더를 반환한다 """
+    return ("--%s\r\n"
+            "Content-Type: %s\r\n"
+            "Content-Length: %d\r\n"
+            "Content-Location: %s\r\n"
+            "\r\n" % (boundary, mimetype or get_mimetype(name), length, quote(name))).encode('ascii')
+
+
+def iter_batch_pages(handle, names, boundary):
+    """ 이미지(names)를 multipart 파트로 이어서 반환한다 """
+    for name in names:
+        data = page_cache.get((handle.identity, name))
+        metrics.inc_cache('page', data is not None)
+        if data is not None:
+            img = BytesIO(data), len(data)
         else:
-            app.logger.info(name + " ignore")
+            img = open_image_in_archive(handle.path, name)
+        if img is None:
+            # 이미 길이를 알렸으므로 읽을 수 없는 멤버가 있으면 응답을 중단한다
+            raise IOError("Can not open member: " + name)
+
+        yield make_batch_part_header(boundary, name, img[1])
+        for chunk in iter_stream(img[0], CONF_STREAM_CHUNK_SIZE, img[1]):
+            yield chunk
+        yield b"\r\n"
+    yield ("--%s--\r\n" % boundary).encode('ascii')
+
+
+def make_batch_response(archive_path, names, etag):
+    """ 압축파일(archive_path)의 이미지(names)를 하나의 multipart/mixed 응답으로 반환한다 """
+    handle = archive_cache.get(archive_path)
+    boundary = "lightcomics-" + etag
+    length = len(("--%s--\r\n" % boundary).encode('ascii'))
+    for name in names:
+        size = handle.members[name].file_size
+        length += len(make_batch_part_header(boundary, name, size)) + size + 2
+
+    body = iter_batch_pages(handle, names, boundary)
+    if volume_local.pool is not None:
+        # 멤버를 여는 일까지 볼륨 스레드에서 하도록 파트 단위로 넘긴다
+        body = VolumeIterator(body, volume_local.pool)
+    response = flask.Response(body,
+                              mimetype='multipart/mixed',
+                              direct_passthrough=True)
+    response.content_type = 'multipart/mixed; boundary=%s' % boundary
+    response.content_length = length
+    return response
+
+
+# 리사이즈 크기, 품질 단계 (요청 값을 바로 위 단계로 올려 변환 작업과 캐시 항목 수를 제한한다)
+RESIZE_SIZES = (160, 320, 480, 640, 800, 1024, 1280, 1600, 2048, 2560, 3200, 4096)
+RESIZE_QUALITIES = (40, 60, 70, 80, 90, 95)
+
+
+def get_resize_arg(name, steps):
+    """ 요청 인자(name)를 steps 중 같거나 큰 가장 작은 단계로 올려 반환한다. 없으면 None, 숫자가 아니거나 범위 밖이면 ValueError를 발생시킨다. """
+    value = request.args.get(name)
+    if value is None:
+        return None
+    if not (value.isascii() and value.isdigit()):
+        raise ValueError("invalid " + name)
+    value = int(value)
+    if not 1 <= value <= steps[-1]:
+        raise ValueError("invalid " + name)
+    return steps[bisect.bisect_left(steps, value)]
+
+
+def get_resize_params():
+    """ 요청의 width, height, quality 값을 반환한다. 리사이즈 요청이 아니면 None, 잘못된 값이면 ValueError를 발생시킨다. """
+    width = get_resize_arg('width', RESIZE_SIZES)
+    height = get_resize_arg('height', RESIZE_SIZES)
+    if width is None and height is None:
+        return None
+
+    quality = get_resize_arg('quality', RESIZE_QUALITIES)
+    if quality is None:
+        quality = RESIZE_QUALITIES[bisect.bisect_left(RESIZE_QUALITIES,
+                                                      min(max(CONF_TRANSCODE_QUALITY, 1), 95))]
+    return width, height, quality
+
+
+def resize_image(data, width, height, quality):
+    """ 이미지(data)를 width x height 안에 맞게 축소하여 JPEG 바이트로 반환한다 """
+    im = Image.open(data)
+    box = (width or im.size[0], height or im.size[1])
+    if im.format == 'JPEG':
+        # DCT 단계에서 1/2, 1/4, 1/8로 축소하여 디코딩한다
+        im.draft('RGB', box)
+    im.thumbnail(box, Image.LANCZOS)
+    if im.mode not in ('RGB', 'L'):
+        im = im.convert('RGB')
+
+    output = BytesIO()
+    im.save(output, 'JPEG', quality=quality)
+    return output.getvalue()
+
+
+def get_resized_image_path(archive_path, img_path, resize_params):
+    """ 압축파일 또는 이미지 폴더(archive_path)의 이미지(img_path)를 리사이즈한 캐시 파일 경로를 반환한다. 이미지가 없으면 None을 반환한다. """
+    if os.path.isdir(archive_path):
+        # 이미지 폴더는 이미지 파일 자체로 식별한다
+        file_path = os.path.join(archive_path, img_path)
+        identity = get_archive_identity(file_path)
+    else:
+        identity = get_archive_identity(archive_path)
+    key = DiskCache.make_key(identity, img_path, *resize_params)
+    cached_path = transcode_cache.get(key)
+    metrics.inc_cache('transcode', cached_path is not None)
+    if cached_path is not None:
+        return cached_path
+
+    if os.path.isdir(archive_path):
+        img = open_image_in_dir(file_path)
+    else:
+        img = open_image_in_archive(archive_path, img_path)
+    if img is None:
+        return None
+
+    with img[0] as f:
+        data = BytesIO(f.read())
+    return transcode_cache.put(key, resize_image(data, *resize_params))
+
+
+def make_resized_page_response(archive_path, img_path, resize_params, etag=None):
+    """ 리사이즈한 이미지 응답을 반환한다. 이미지가 없으면 None을 반환한다. """
+    file_path = get_resized_image_path(archive_path, img_path, resize_params)
+    if file_path is None:
+        return None
+
+    file_name = os.path.splitext(os.path.basename(img_path))[0] + ".jpg"
+    return make_file_range_response(file_path, 0, os.path.getsize(file_path),
+                                    file_name, etag)
+
+
+def get_cover_name(handle):
+    """ 압축파일 핸들(handle)에서 표지로 쓸 이미지(복원된 이름으로 자연 정렬한 첫 이미지)를 반환한다. 이미지가 없으면 None을 반환한다. """
+    decoded_names = handle.get_decoded_names()
+    return min(handle.get_image_names(), key=lambda name: natural_sort_key(decoded_names[name]),
+               default=None)
+
+
+def get_cover_path(archive_path, identity):
+    """ 압축파일(archive_path)의 표지 썸네일 캐시 파일 경로를 반환한다. 이미지가 없으면 None을 반환한다. """
+    key = DiskCache.make_key('cover', identity, CONF_COVER_WIDTH, CONF_COVER_HEIGHT, CONF_COVER_QUALITY)
+    cached_path = cover_cache.get(key)
+    metrics.inc_cache('cover', cached_path is not None)
+    if cached_path is not None:
+        return cached_path
+
+    # 표지 작업이 읽고 있는 압축파일의 핸들을 캐시에서 밀어내지 않도록 따로 열고 닫는다
+    handle = ArchiveHandle(archive_path, identity)
+    try:
+        name = get_cover_name(handle)
+        if name is None:
+            return None
+        with TimedReader(handle.open_member(name), 'lightcomics_decompress_seconds_total') as f:
+            data = BytesIO(f.read())
+    finally:
+        handle.close()
+    return cover_cache.put(key, resize_image(data, CONF_COVER_WIDTH, CONF_COVER_HEIGHT,
+                                             CONF_COVER_QUALITY))
+
+
+# 표지를 만들 수 없었던 압축파일을 기억하는 개수
+COVER_MAX_FAILED = 1024
+
+
+# 표지 썸네일 생성 (리스팅한 압축파일의 표지를 백그라운드에서 미리 만든다)
+class CoverGenerator:
+    def __init__(self, workers):
+        self.workers = workers
+        self._lock = threading.Lock()
+        # 압축파일 경로 -> future
+        self._pending = {}
+        # 압축파일 경로 -> 표지를 만들 수 없었던 식별정보 (LRU)
+        self._failed = OrderedDict()
+
+    def generate(self, archive_path):
+        """ 압축파일(archive_path)의 표지를 만들어 캐시 파일 경로를 반환한다. 만들 수 없으면 None을 반환한다. """
+        try:
+            identity = get_archive_identity(archive_path)
+        except OSError:
+            return None
+        with self._lock:
+            if self._failed.get(archive_path) == identity:
+                return None
+
+        try:
+            cover_path = get_cover_path(archive_path, identity)
+        except Exception:
+            logger.debug("cover failed: %s", archive_path)
+            cover_path = None
+
+        if cover_path is None:
+            with self._lock:
+                self._failed[archive_path] = identity
+                while len(self._failed) > COVER_MAX_FAILED:
+                    self._failed.popitem(last=False)
+        return cover_path
+
+    def _run(self, archive_path):
+        try:
+            return self.generate(archive_path)
+        finally:
+            with self._lock:
+                self._pending.pop(archive_path, None)
+
+    def schedule(self, archive_paths):
+        """ 압축파일(archive_paths)의 표지를 백그라운드에서 순서대로 만든다 """
+        if self.workers <= 0:
+            return
+        with self._lock:
+            for archive_path in archive_paths:
+                if archive_path not in self._pending:
+                    executor = get_volume_executor(archive_path, 'cover')
+                    self._pending[archive_path] = executor.submit(self._run, archive_path)
+
+    def get(self, archive_path):
+        """ 압축파일(archive_path)의 표지 경로를 반환한다. 예약된 작업이 아직 시작되지 않았으면 취소하고 바로 만든다. """
+        with self._lock:
+            future = self._pending.get(archive_path)
+        if future is not None:
+            if not future.cancel():
+                return future.result()
+            with self._lock:
+                if self._pending.get(archive_path) is future:
+                    del self._pending[archive_path]
+        return self.generate(archive_path)
+
+
+cover_generator = CoverGenerator(CONF_COVER_WORKERS)
+
+
+def get_cover_names(entry):
+    """ 요청의 name 목록 또는 offset, limit 범위에 해당하는 폴더(entry)의 압축파일 이름을 리스팅 순서로 반환한다. 잘못된 요청이면 ValueError를 발생시킨다. """
+    names = request.args.getlist('name')
+    if not names:
+        offset = request.args.get('offset', 0, type=int)
+        limit = request.args.get('limit', CONF_COVER_BATCH_MAX, type=int)
+        if offset < 0 or limit < 0:
+            raise ValueError("invalid range")
+        return entry.archives[offset:offset + min(limit, CONF_COVER_BATCH_MAX)]
+
+    if len(names) > CONF_COVER_BATCH_MAX:
+        raise ValueError("too many covers")
+    archives = set(entry.archives)
+    return [name for name in OrderedDict.fromkeys(unquote(name) for name in names)
+            if name in archives]
+
+
+def make_cover_batch_response(dir_path, names, etag):
+    """ 폴더(dir_path)의 압축파일(names) 표지를 하나의 multipart/mixed 응답으로 반환한다. 표지가 없는 압축파일은 제외한다. """
+    boundary = "lightcomics-" + etag
+    body = []
+    for name in names:
+        cover_path = cover_generator.get(dir_path + name)
+        if cover_path is None:
+            continue
+        try:
+            with open(cover_path, mode='rb') as f:
+                data = f.read()
+        except OSError:
+            continue
+        body.append(make_batch_part_header(boundary, name, len(data), 'image/jpeg'))
+        body.append(data)
+        body.append(b"\r\n")
+    if not body:
+        return None
+    body.append(("--%s--\r\n" % boundary).encode('ascii'))
+
+    response = flask.Response(b"".join(body), mimetype='multipart/mixed')
+    response.content_type = 'multipart/mixed; boundary=%s' % boundary
+    return response
+
+
+def negotiate_content_encoding():
+    """ Accept-Encoding 헤더에 따라 JSON 응답에 사용할 압축 방식(br, gzip, 없음)을 반환한다 """
+    accept_encodings = request.accept_encodings
+    if IS_INSTALLED_BROTLI_MODULE and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def make_json_response(obj, content_encoding=None):
+    """ obj를 JSON으로 직렬화한 응답을 반환한다. 기본은 압축 형식, pretty=1 이면 들여쓰기 한다. """
+    if CONF_JSON_PRETTY or request.args.get('pretty') == "1":
+        data = json.dumps(obj, indent=4, default=model_to_json)
+    else:
+        data = json.dumps(obj, separators=(',', ':'), default=model_to_json)
+    data = data.encode('utf-8')
+
+    headers = {'Vary': 'Accept-Encoding'}
+    if content_encoding is not None and len(data) >= CONF_COMPRESS_MIN_SIZE:
+        if content_encoding == 'br':
+            data = brotli.compress(data, quality=5)
+        else:
+            data = gzip.compress(data, compresslevel=5)
+        headers['Content-Encoding'] = content_encoding
+
+    return flask.Response(data, headers=headers, mimetype=BASE_MIME_TYPE)
+
+
+def is_ndjson_requested():
+    """ 요청이 NDJSON 스트리밍 응답을 원하는지 반환한다 (stream=1 또는 Accept: application/x-ndjson) """
+    if request.args.get('stream') == "1":
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIME_TYPE
+
+
+def make_ndjson_response(models):
+    """ 모델(models)을 만들어지는 대로 한 줄에 하나씩 JSON으로 보내는 응답을 반환한다 """
+    def generate():
+        for model in models:
+            yield json.dumps(model, separators=(',', ':'), default=model_to_json).encode('utf-8') + b"\n"
+
+    return flask.Response(generate(), mimetype=NDJSON_MIME_TYPE)
+
+
+def make_etag(*parts):
+    """ parts로부터 strong ETag 값을 생성하여 반환한다 """
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode('utf-8', 'surrogateescape'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def get_path_validators(path, *parts):
+    """ 경로(path)의 크기, 수정시간과 parts로부터 (ETag, Last-Modified)를 반환한다 """
+    stat = os.stat(path)
+    etag = make_etag(CONF_ROOT_PATH, path, stat.st_size, stat.st_mtime_ns, *parts)
+    return etag, int(stat.st_mtime)
+
+
+def is_not_modified(etag, last_modified=None):
+    """ 요청의 If-None-Match 또는 If-Modified-Since 조건으로 304 응답이 가능한지 확인한다 """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+
+    if_modified_since = request.if_modified_since
+    if if_modified_since is None or last_modified is None:
+        return False
+    if if_modified_since.tzinfo is None:
+        if_modified_since = if_modified_since.replace(tzinfo=datetime.timezone.utc)
+    return last_modified <= if_modified_since.timestamp()
+
+
+def set_validators(response, etag, last_modified=None, max_age=None):
+    """ 응답(response)에 ETag, Last-Modified, Cache-Control 헤더를 설정한다 """
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    if max_age:
+        response.headers['Cache-Control'] = 'private, max-age=%d' % max_age
+    else:
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def make_not_modified_response(etag, last_modified=None, max_age=None):
+    """ 304 응답을 반환한다 """
+    return set_validators(flask.Response(status=304), etag, last_modified, max_age)
+
+
+# LRU 캐시 (항목 개수 제한)
+class LRUCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > max(self.max_size, 1):
+                self._items.popitem(last=False)
+
+
+listing_cache = LRUCache(CONF_LISTING_CACHE_SIZE)
+
+
+def get_listing_entry(path):
+    """ 디렉토리(path)의 리스팅 항목을 반환한다. 카탈로그에 없으면 디스크에서 읽어 캐시한다. """
+    entry = library_catalog.get(path)
+    if CONF_CATALOG_ENABLED:
+        metrics.inc_cache('catalog', entry is not None)
+    if entry is not None:
+        return entry
+
+    entry = listing_cache.get(path)
+    if entry is not None and entry.mtime_ns == os.stat(path).st_mtime_ns:
+        metrics.inc_cache('listing', True)
+        return entry
+
+    metrics.inc_cache('listing', False)
+
+    entry = CatalogDirectory(*scan_directory(path))
+    listing_cache.put(path, entry)
+    return entry
+
+
+def get_listing_model(path, offset=0, limit=None):
+    """ 리스팅 (limit이 있으면 디렉토리, 압축파일, 이미지 순서로 offset부터 limit개만 반환한다) """
+    entry = get_listing_entry(path)
+    base_path = os.path.join(path, "").replace("\\", "/")
+
+    if limit is None:
+        listing_model = BaseListingModel()
+        listing_model._directories = [base_path + name for name in entry.directories]
+        listing_model._archives = [base_path + name for name in entry.archives]
+        listing_model._images = [base_path + name for name in entry.images]
+        return listing_model
+
+    listing_model = BasePagedListingModel()
+    listing_model._offset = offset
+    listing_model._limit = limit
+    listing_model._total = len(entry.directories) + len(entry.archives) + len(entry.images)
+
+    start = offset
+    stop = offset + limit
+    for names, paths in ((entry.directories, listing_model._directories),
+                         (entry.archives, listing_model._archives),
+                         (entry.images, listing_model._images)):
+        paths.extend(base_path + name for name in names[max(start, 0):max(stop, 0)])
+        start -= len(names)
+        stop -= len(names)
 
     return listing_model
 
 
+def get_listing_validators(path, content_encoding=None):
+    """ 리스팅(path)의 (ETag, Last-Modified)를 반환한다. 카탈로그에 있으면 디스크를 읽지 않는다. """
+    entry = library_catalog.get(path)
+    if entry is None:
+        return get_path_validators(path, 'listing', request.query_string,
+                                   content_encoding)
+
+    etag = make_etag(CONF_ROOT_PATH, path, entry.mtime_ns, 'listing',
+                     request.query_string, content_encoding)
+    return etag, entry.mtime_ns // 1000000000
+
+
 def get_unique_identifier(path):
     """ path에 해당하는 고유값을 생성하여 반환한다 """
     path = remove_trail_slash(path)
     createdate = int(os.stat(path).st_ctime)
     filesize = int(get_size_of(path))
-    app.logger.info("createdate: " + str(createdate))
-    app.logger.info("filesize: " + str(filesize))
+    app.logger.debug("createdate: %s", createdate)
+    app.logger.debug("filesize: %s", filesize)
     uniqueue_identifier = str(createdate + filesize)
-    app.logger.info(uniqueue_identifier)
+    app.logger.debug(uniqueue_identifier)
     return uniqueue_identifier
 
 
@@ -372,6 +2166,13 @@ def get_real_path(base, abs_path):
     return real_path
 
 
+def is_path_in_root(path):
+    """ 경로(path)가 ROOT 안에 있으면 True를 반환한다 (심볼릭 링크와 '..'을 풀어서 비교한다) """
+    real_root = os.path.join(os.path.realpath(CONF_ROOT_PATH), "")
+    real_path = os.path.realpath(path)
+    return real_path == real_root[:-1] or real_path.startswith(real_root)
+
+
 def remove_trail_slash(s):
     """ 마지막 slash를 제거한다 """
     if s.endswith('/'):
@@ -379,20 +2180,1037 @@ def remove_trail_slash(s):
     return s
 
 
+# 디렉토리 크기 인덱스
+class DirectorySize:
+    def __init__(self, mtime_ns, files_size, subdirs, scanned_at):
+        self.mtime_ns = mtime_ns
+        self.files_size = files_size
+        self.subdirs = subdirs
+        self.scanned_at = scanned_at
+        self.total_size = 0
+        self.checked_at = 0
+
+
+# 크기 인덱스에 기억하는 디렉토리 수의 상한
+SIZE_INDEX_MAX_ENTRIES = 100000
+
+
+class DirectorySizeIndex:
+    def __init__(self, ttl, file_ttl):
+        # ttl: 결과를 그대로 쓰는 시간, file_ttl: 수정시간이 같은 디렉토리의 파일 크기를 다시 읽는 주기
+        self.ttl = ttl
+        self.file_ttl = file_ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get_size(self, path):
+        """ 경로(path)의 크기를 반환한다. 디렉토리는 하위 항목 크기를 모두 더한다. """
+        stat = os.stat(path)
+        if not os.path.isdir(path):
+            return stat.st_size
+        return self._get_directory_size(path, stat)
+
+    def _get_entry(self, path):
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None:
+                self._entries.move_to_end(path)
+            return entry
+
+    def _put_entry(self, path, entry):
+        with self._lock:
+            self._entries[path] = entry
+            self._entries.move_to_end(path)
+            while len(self._entries) > SIZE_INDEX_MAX_ENTRIES:
+                self._entries.popitem(last=False)
+
+    def _get_directory_size(self, path, stat):
+        now = time.monotonic()
+        entry = self._get_entry(path)
+        if entry is not None and now - entry.checked_at < self.ttl:
+            return entry.total_size
+
+        # 디렉토리 수정시간이 같으면 직속 파일 목록과 크기는 그대로 사용한다 (디렉토리당 stat 한 번).
+        # 파일을 덮어쓰거나 이어 쓰면 디렉토리 수정시간이 바뀌지 않으므로 file_ttl이 지나면 파일 크기를 다시 읽는다.
+        if (entry is None or entry.mtime_ns != stat.st_mtime_ns
+                or now - entry.scanned_at >= self.file_ttl):
+            files_size = 0
+            subdirs = []
+            with os.scandir(path) as it:
+                for item in it:
+                    try:
+                        if item.is_file():
+                            files_size += item.stat().st_size
+                        elif item.is_dir():
+                            subdirs.append(item.path)
+                    except OSError:
+                        continue
+            entry = DirectorySize(stat.st_mtime_ns, files_size, subdirs, now)
+
+        total_size = stat.st_size + entry.files_size
+        for subdir in entry.subdirs:
+            try:
+                total_size += self._get_directory_size(subdir, os.stat(subdir))
+            except OSError:
+                continue
+
+        entry.total_size = total_size
+        entry.checked_at = now
+        self._put_entry(path, entry)
+        return total_size
+
+
+directory_size_index = DirectorySizeIndex(CONF_SIZE_INDEX_TTL, CONF_SIZE_INDEX_FILE_TTL)
+
+
 def get_size_of(path):
     """ 해당 경로 파일 또는 디렉토리의 사이즈를 구하여 반환한다 """
-    total_size = os.path.getsize(path)
+    return directory_size_index.get_size(path)
+
+
+# inotify (Linux)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+INOTIFY_WATCH_MASK = (IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+                      | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+INOTIFY_EVENT_HEADER = struct.Struct('iIII')
+
+
+class Inotify:
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path, mask):
+        """ 경로(path)를 감시하고 watch descriptor를 반환한다 """
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        return wd
+
+    def read_events(self):
+        """ 대기중인 이벤트를 (wd, mask, name) 목록으로 반환한다 """
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + INOTIFY_EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = INOTIFY_EVENT_HEADER.unpack_from(data, offset)
+            offset += INOTIFY_EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+def scan_directory(path):
+    """ 디렉토리(path)를 한번 읽어 (수정시간, 디렉토리, 압축파일, 이미지 이름 목록, 실제 하위 디렉토리)를 반환한다. 이름은 자연 정렬한다. """
+    directories = []
+    archives = []
+    images = []
+    subdirs = []
+    mtime_ns = os.stat(path).st_mtime_ns
+    with os.scandir(path) as it:
+        for item in it:
+            try:
+                if item.is_dir():
+                    directories.append(item.name)
+                    if not item.is_symlink():
+                        subdirs.append(item.name)
+                elif is_extensions_allow_archive(item.name):
+                    archives.append(item.name)
+                elif is_extensions_allow_image(item.name):
+                    images.append(item.name)
+            except OSError:
+                continue
+
+    directories.sort(key=natural_sort_key)
+    archives.sort(key=natural_sort_key)
+    images.sort(key=natural_sort_key)
+    return mtime_ns, directories, archives, images, subdirs
+
+
+# 라이브러리 카탈로그 항목
+class CatalogDirectory:
+    def __init__(self, mtime_ns, directories, archives, images, subdirs):
+        self.mtime_ns = mtime_ns
+        self.directories = directories
+        self.archives = archives
+        self.images = images
+        self.subdirs = subdirs
+
+
+# 라이브러리 카탈로그 (백그라운드 인덱서)
+# 색인하지 않는 워커가 저장된 카탈로그 변경을 읽는 주기 (초)
+CATALOG_FOLLOW_INTERVAL = 1.0
+
+
+class LibraryCatalog:
+    def __init__(self, db_path, rescan_interval):
+        self.db_path = db_path
+        self.rescan_interval = rescan_interval
+        self.root = None
+        self._lock = threading.Lock()
+        self._directories = {}
+        self._listeners = []
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._inotify = None
+        self._watches = {}
+        self._watched = set()
+        self._dirty = set()
+        # 마지막으로 불러온 변경 번호
+        self._seq = 0
+        self._lock_file = None
+
+    def add_listener(self, listener):
+        """ 디렉토리 내용이 바뀌면 listener(dir_path, catalog_directory)를 호출한다. 삭제시에는 None이 전달된다. """
+        self._listeners.append(listener)
+
+    @staticmethod
+    def normalize(path):
+        """ 카탈로그 키로 사용할 디렉토리 경로를 반환한다 """
+        path = path.replace("\\", "/")
+        stripped = path.rstrip("/")
+        if stripped == "" or stripped.endswith(":"):
+            return stripped + "/"
+        return stripped
+
+    def start(self, root):
+        """ root 경로의 카탈로그를 백그라운드에서 구성하고 갱신한다 """
+        root = self.normalize(root)
+        if self._thread is not None and self._thread.is_alive():
+            if self.root == root:
+                return
+            self.stop()
+
+        if self.root is not None and self.root != root:
+            self._remove_tree(self.root)
+        self.root = root
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="catalog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._thread = None
+
+    def get(self, path):
+        """ 디렉토리(path)의 카탈로그 항목을 반환한다. 아직 색인되지 않았거나 바뀐 디렉토리면 None을 반환한다. """
+        if self._thread is None:
+            return None
+        entry = self._directories.get(self.normalize(path))
+        # 이 프로세스가 inotify로 감시하지 않으면(다른 워커가 색인 중이거나 inotify가 없으면) 수정시간을 확인한다
+        if entry is not None and self._inotify is None:
+            try:
+                if os.stat(path).st_mtime_ns != entry.mtime_ns:
+                    return None
+            except OSError:
+                return None
+        return entry
+
+    def items(self):
+        """ (디렉토리 경로, 카탈로그 항목) 목록을 반환한다 """
+        with self._lock:
+            return list(self._directories.items())
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS catalog ("
+            " dir_path TEXT PRIMARY KEY,"
+            " mtime_ns INTEGER NOT NULL,"
+            " listing TEXT NOT NULL)")
+        # 변경 번호 (다른 워커가 바뀐 항목만 읽어간다). 삭제된 디렉토리는 listing이 빈 문자열로 남는다.
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(catalog)")]
+        if 'seq' not in columns:
+            conn.execute("ALTER TABLE catalog ADD COLUMN seq INTEGER NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS catalog_seq ON catalog (seq)")
+        conn.commit()
+        return conn
+
+    def _load(self, conn):
+        """ 저장된 카탈로그에서 마지막으로 불러온 이후 바뀐 항목을 불러온다 """
+        prefix = self.root.rstrip("/") + "/"
+        rows = conn.execute(
+            "SELECT dir_path, mtime_ns, listing, seq FROM catalog"
+            " WHERE seq > ? AND (dir_path = ? OR substr(dir_path, 1, ?) = ?)"
+            " ORDER BY seq",
+            (self._seq, self.root, len(prefix), prefix)).fetchall()
+        for dir_path, mtime_ns, listing, seq in rows:
+            if listing:
+                directories, archives, images, subdirs = json.loads(listing)
+                self._set(dir_path, CatalogDirectory(mtime_ns, directories, archives,
+                                                     images, subdirs))
+            else:
+                self._remove(dir_path)
+            self._seq = max(self._seq, seq)
+
+    def _save(self, conn, changed, removed):
+        if not changed and not removed:
+            return
+        seq = conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM catalog").fetchone()[0]
+        conn.executemany(
+            "INSERT OR REPLACE INTO catalog VALUES (?, ?, ?, ?)",
+            [(dir_path, entry.mtime_ns,
+              json.dumps([entry.directories, entry.archives, entry.images,
+                          entry.subdirs]), seq)
+             for dir_path, entry in changed]
+            + [(dir_path, 0, "", seq) for dir_path in removed])
+        conn.commit()
+        self._seq = seq
+
+    def _acquire_indexer_lock(self):
+        """ 색인 잠금을 얻으면 True를 반환한다. 잠금은 프로세스가 끝나면 풀려 다른 워커가 이어받는다. """
+        if not IS_INSTALLED_FCNTL_MODULE:
+            return True
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        lock_file = open(self.db_path + ".lock", mode='a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _release_indexer_lock(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _set(self, dir_path, entry):
+        with self._lock:
+            self._directories[dir_path] = entry
+        for listener in self._listeners:
+            listener(dir_path, entry)
+
+    def _remove(self, dir_path):
+        with self._lock:
+            entry = self._directories.pop(dir_path, None)
+        if entry is not None:
+            for listener in self._listeners:
+                listener(dir_path, None)
+
+    def _remove_tree(self, dir_path):
+        """ dir_path 이하의 카탈로그 항목을 삭제하고 삭제된 경로 목록을 반환한다 """
+        prefix = dir_path.rstrip("/") + "/"
+        with self._lock:
+            removed = [path for path in self._directories
+                       if path == dir_path or path.startswith(prefix)]
+            for path in removed:
+                del self._directories[path]
+        for path in removed:
+            for listener in self._listeners:
+                listener(path, None)
+        return removed
+
+    def _join(self, dir_path, name):
+        return dir_path.rstrip("/") + "/" + name
+
+    def _scan_tree(self, dir_path, force=False):
+        """
+        dir_path 이하에서 수정시간이 바뀐 디렉토리만 다시 읽는다. (변경, 삭제) 목록을 반환한다.
+        force인 경우 dir_path는 무조건 다시 읽고, 하위는 아직 색인되지 않은 디렉토리만 읽는다.
+        """
+        changed = []
+        removed = []
+        stack = [dir_path]
+        while stack and not self._stop_event.is_set():
+            path = stack.pop()
+            old_entry = self._directories.get(path)
+            try:
+                if (not force or path != dir_path) and old_entry is not None \
+                        and os.stat(path).st_mtime_ns == old_entry.mtime_ns:
+                    entry = old_entry
+                else:
+                    entry = CatalogDirectory(*scan_directory(path))
+            except OSError:
+                removed.extend(self._remove_tree(path))
+                continue
+
+            if entry is not old_entry:
+                if old_entry is not None:
+                    for name in set(old_entry.subdirs) - set(entry.subdirs):
+                        removed.extend(self._remove_tree(self._join(path, name)))
+                self._set(path, entry)
+                changed.append((path, entry))
+
+            self._watch(path)
+            for name in entry.subdirs:
+                subdir = self._join(path, name)
+                if not force or subdir not in self._directories:
+                    stack.append(subdir)
+        return changed, removed
+
+    def _watch(self, dir_path):
+        if self._inotify is None or dir_path in self._watched:
+            return
+        try:
+            wd = self._inotify.add_watch(dir_path, INOTIFY_WATCH_MASK)
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                logger.warning("inotify watch 한도를 초과하여 주기적 재검색에 의존합니다: %s", dir_path)
+                self._inotify.close()
+                self._inotify = None
+                self._watches.clear()
+                self._watched.clear()
+            return
+        # 이름이 바뀐 디렉토리는 같은 wd가 반환된다
+        self._watched.discard(self._watches.get(wd))
+        self._watches[wd] = dir_path
+        self._watched.add(dir_path)
+
+    def _handle_events(self):
+        for wd, mask, name in self._inotify.read_events():
+            if mask & IN_Q_OVERFLOW:
+                self._dirty.add(self.root)
+                continue
+            dir_path = self._watches.get(wd)
+            if mask & IN_IGNORED:
+                self._watched.discard(self._watches.pop(wd, None))
+                continue
+            if dir_path is None:
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                self._dirty.add(os.path.dirname(dir_path) or "/")
+            else:
+                self._dirty.add(dir_path)
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    self._dirty.add(self._join(dir_path, name))
+
+    def _run(self):
+        conn = self._connect()
+        self._seq = 0
+        try:
+            # 여러 워커 프로세스 중 잠금을 얻은 하나만 색인하고, 나머지는 저장된 변경을 따라 읽는다
+            while True:
+                try:
+                    self._load(conn)
+                except (sqlite3.Error, ValueError):
+                    logger.exception("카탈로그를 불러오지 못했습니다.")
+                if self._stop_event.is_set() or self._acquire_indexer_lock():
+                    break
+                self._stop_event.wait(CATALOG_FOLLOW_INTERVAL)
+
+            if not self._stop_event.is_set():
+                # 잠금을 얻기 전까지 저장된 변경을 마저 불러온다
+                try:
+                    self._load(conn)
+                except (sqlite3.Error, ValueError):
+                    logger.exception("카탈로그를 불러오지 못했습니다.")
+                self._index(conn)
+        finally:
+            self._release_indexer_lock()
+            conn.close()
+
+    def _index(self, conn):
+        if IS_OS_LINUX:
+            try:
+                self._inotify = Inotify()
+            except (OSError, AttributeError):
+                logger.warning("inotify를 사용할 수 없어 주기적 재검색에 의존합니다.")
+
+        next_rescan = 0
+        try:
+            while not self._stop_event.is_set():
+                now = time.monotonic()
+                if now >= next_rescan:
+                    self._dirty.clear()
+                    self._save(conn, *self._scan_tree(self.root))
+                    next_rescan = time.monotonic() + self.rescan_interval
+
+                timeout = max(0.0, next_rescan - time.monotonic())
+                if self._inotify is None:
+                    self._stop_event.wait(min(timeout, 1.0))
+                    continue
+
+                if self._dirty:
+                    timeout = min(timeout, 0.5)
+                readable, _, _ = select.select([self._inotify.fd], [], [], min(timeout, 1.0))
+                if readable:
+                    self._handle_events()
+                    continue
+
+                # 이벤트가 잠잠해지면 변경된 디렉토리를 한꺼번에 다시 읽는다
+                dirty = self._dirty
+                self._dirty = set()
+                for dir_path in sorted(dirty):
+                    self._save(conn, *self._scan_tree(dir_path, force=True))
+        finally:
+            if self._inotify is not None:
+                self._inotify.close()
+                self._inotify = None
+            self._watches.clear()
+            self._watched.clear()
+
+
+library_catalog = LibraryCatalog(os.path.join(CONF_CACHE_PATH, "lightcomics.db"),
+                                 CONF_CATALOG_RESCAN_INTERVAL)
+
+
+def get_repaired_name(name):
+    """ cp437로 잘못 해석된 cp949 이름이면 복원한 이름을 반환한다. cp437, cp949로 그대로 되돌릴 수 없거나 바뀌는 것이 없으면 None을 반환한다. """
+    try:
+        repaired = name.encode('cp437').decode('cp949')
+        if repaired == name or repaired.encode('cp949').decode('cp437') != name:
+            return None
+    except UnicodeError:
+        return None
+    return repaired
 
-    if os.path.isdir(path) == False:
-        return total_size
 
-    for item in os.listdir(path):
-        itempath = os.path.join(path, item).replace("\\", "/")
-        if os.path.isfile(itempath):
-            total_size += os.path.getsize(itempath)
-        elif os.path.isdir(itempath):
-            total_size += get_size_of(itempath)
-    return total_size
+def normalize_search_text(text):
+    """ 검색용으로 문자열을 정규화한다 (NFC, 대소문자 무시) """
+    return unicodedata.normalize('NFC', text).casefold()
+
+
+def get_trigrams(text):
+    """ 문자열(text)의 trigram 집합을 반환한다. 앞뒤에 공백을 붙여 접두어도 색인한다. """
+    text = " " + text + " "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+# 질의 하나가 확인하는 후보 문서 수의 상한 (짧은 질의, 유사도 검색이 전체 색인을 훑지 않도록)
+SEARCH_MAX_CANDIDATES = 5000
+
+
+# 검색 인덱스 (trigram)
+class SearchIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self._next_id = 0
+        # doc id -> (전체 경로, 종류, 표시 이름, 정규화된 이름[, 정규화된 복원 이름])
+        self._docs = {}
+        self._path_ids = {}
+        self._dir_children = {}
+        # trigram -> doc id 배열 (삭제된 문서는 _docs에 없는 것으로 판단한다)
+        self._postings = {}
+        self._posting_count = 0
+
+    def update_directory(self, dir_path, entry):
+        """ 카탈로그 디렉토리(dir_path)의 하위 디렉토리, 압축파일을 색인에 반영한다 """
+        base_path = dir_path.rstrip("/") + "/"
+        children = {}
+        if entry is not None:
+            for name in entry.directories:
+                children[base_path + name] = (name, 'directory')
+            for name in entry.archives:
+                children[base_path + name] = (name, 'archive')
+
+        with self._lock:
+            old_children = self._dir_children.pop(dir_path, set())
+            for path in old_children - children.keys():
+                self._docs.pop(self._path_ids.pop(path, None), None)
+            for path in children.keys() - old_children:
+                self._add(path, *children[path])
+            if children:
+                self._dir_children[dir_path] = set(children)
+            if self._posting_count > 4 * 20 * max(len(self._docs), 1000):
+                self._compact()
+
+    def _add(self, path, name, kind):
+        doc_id = self._next_id
+        self._next_id += 1
+        # 이름은 그대로 보여주고, 인코딩이 깨진 이름은 복원한 이름으로도 찾을 수 있게 한다
+        search_names = (normalize_search_text(name),)
+        repaired = get_repaired_name(name)
+        if repaired is not None:
+            search_names += (normalize_search_text(repaired),)
+        self._docs[doc_id] = (path, kind, name) + search_names
+        self._path_ids[path] = doc_id
+        grams = set()
+        for search_name in search_names:
+            grams |= get_trigrams(search_name)
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is None:
+                posting = self._postings[gram] = array('i')
+            posting.append(doc_id)
+            self._posting_count += 1
+
+    def _compact(self):
+        """ 삭제된 문서를 posting 목록에서 제거한다 """
+        self._posting_count = 0
+        for gram in list(self._postings):
+            posting = array('i', (doc_id for doc_id in self._postings[gram]
+                                  if doc_id in self._docs))
+            if posting:
+                self._postings[gram] = posting
+                self._posting_count += len(posting)
+            else:
+                del self._postings[gram]
+
+    def search(self, query, limit):
+        """ 질의(query)와 비슷한 이름을 점수 순으로 (점수, 전체 경로, 종류, 표시 이름) 목록으로 반환한다 """
+        query = normalize_search_text(query).strip()
+        if not query:
+            return []
+        query_grams = get_trigrams(query)
+        if len(query) < 3:
+            # 짧은 질의는 접두어 trigram(" ab")만 사용한다
+            query_grams = {" " + query} if len(query) == 2 else set()
+
+        # 부분 문자열 일치: 질의 내부 trigram 중 가장 드문 것의 문서만 확인한다
+        inner_grams = [query[i:i + 3] for i in range(len(query) - 2)]
+
+        # 잠금 안에서는 후보 문서 id만 복사하고, 점수 계산은 잠금 밖에서 한다 (카탈로그 갱신을 막지 않도록)
+        with self._lock:
+            if query_grams:
+                postings = sorted((self._postings[gram] for gram in query_grams
+                                   if gram in self._postings), key=len)
+            else:
+                postings = []
+
+            if inner_grams:
+                exact_candidates = min((self._postings.get(gram, ()) for gram in inner_grams),
+                                       key=len)
+            elif len(query) == 2:
+                exact_candidates = postings[0] if postings else ()
+            else:
+                exact_candidates = self._docs
+            exact_candidates = list(islice(exact_candidates, SEARCH_MAX_CANDIDATES))
+
+            # 유사도 후보는 가장 드문 trigram들의 문서에서 상한까지만 모은다
+            fuzzy_candidates = []
+            remaining = SEARCH_MAX_CANDIDATES
+            for posting in postings[:3]:
+                if remaining <= 0:
+                    break
+                fuzzy_candidates.append(posting[:remaining])
+                remaining -= len(fuzzy_candidates[-1])
+            docs = self._docs
+
+        exact = set()
+        results = []
+        for doc_id in exact_candidates:
+            doc = docs.get(doc_id)
+            if doc is None:
+                continue
+            matched = [search_name for search_name in doc[3:] if query in search_name]
+            if not matched:
+                continue
+            exact.add(doc_id)
+            score = 3.0 if any(search_name.startswith(query) for search_name in matched) else 2.5
+            results.append((score - len(doc[3]) / 10000.0,) + doc[:3])
+
+        # 결과가 부족하면 유사도로 보충한다
+        if len(results) < limit and fuzzy_candidates:
+            candidates = set()
+            for posting in fuzzy_candidates:
+                candidates.update(posting)
+            for doc_id in candidates - exact:
+                doc = docs.get(doc_id)
+                if doc is None:
+                    continue
+                score = max(len(query_grams & get_trigrams(search_name))
+                            for search_name in doc[3:]) / len(query_grams)
+                results.append((score - len(doc[3]) / 10000.0,) + doc[:3])
+
+        return heapq.nlargest(limit, results)
+
+
+search_index = SearchIndex()
+library_catalog.add_listener(search_index.update_directory)
+
+
+def start_background_services(catalog=True):
+    """ 백그라운드 작업(라이브러리 카탈로그, 볼륨별 작업 풀)을 시작한다 """
+    if CONF_CATALOG_ENABLED and catalog:
+        library_catalog.start(CONF_ROOT_PATH)
+    volume_dispatcher.start(CONF_ROOT_PATH)
+
+
+# 요청 프로파일러 (PROFILE_ENABLED 일 때 헤더 요청 또는 표본 추출로 동작한다)
+PROFILE_HEADER = 'X-LightComics-Profile'
+PROFILE_TOP_FUNCTIONS = 10
+PROFILE_FILE_PATTERN = re.compile(r'^\d+-\d+-\d+\.prof$')
+# 이보다 큰 응답은 본문 전송을 측정하지 않는다 (다운로드 등)
+PROFILE_MAX_BODY_SIZE = 4 * 1024 * 1024
+
+
+class RequestProfiler:
+    def __init__(self, profile_path, max_files):
+        self.profile_path = profile_path
+        self.max_files = max_files
+        # 파이썬 3.12부터 프로파일러는 동시에 하나만 동작할 수 있으므로 한 번에 한 요청만 측정한다
+        self._active = threading.Lock()
+        self._lock = threading.Lock()
+        self._records = deque()
+
+    def should_profile(self):
+        """ 현재 요청을 측정할지 반환한다. 헤더 요청은 인증된 경우에만 받아들인다. """
+        if request.headers.get(PROFILE_HEADER) == '1':
+            auth = request.authorization
+            if auth and authention_validate(auth.username, auth.password):
+                return True
+        return CONF_PROFILE_SAMPLE_RATE > 0 and random.random() < CONF_PROFILE_SAMPLE_RATE
+
+    def start(self):
+        """ 프로파일러를 시작하여 반환한다. 다른 요청을 측정 중이면 None을 반환한다. """
+        if not self._active.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            self._active.release()
+            return None
+        return profiler
+
+    def stop(self, profiler):
+        profiler.disable()
+        self._active.release()
+
+    def save(self, profiler, duration, method, path, status):
+        """ 측정 결과를 파일로 저장하고 기록한다 """
+        stats = pstats.Stats(profiler)
+        functions = []
+        for (file_name, line, func), (cc, nc, tt, ct, callers) in sorted(
+                stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:PROFILE_TOP_FUNCTIONS]:
+            functions.append({'function': "%s:%d(%s)" % (file_name, line, func),
+                              'calls': nc,
+                              'tottime_ms': round(tt * 1000, 3),
+                              'cumtime_ms': round(ct * 1000, 3)})
+
+        record = BaseProfileModel()
+        record._time = int(time.time())
+        record._file = "%d-%d-%d.prof" % (time.time() * 1000, os.getpid(), threading.get_ident())
+        record._method = method
+        record._path = path
+        record._status = status
+        record._duration_ms = round(duration * 1000, 3)
+        record._functions = functions
+
+        os.makedirs(self.profile_path, exist_ok=True)
+        stats.dump_stats(os.path.join(self.profile_path, record._file))
+
+        with self._lock:
+            self._records.append(record)
+            while len(self._records) > max(self.max_files, 1):
+                self._records.popleft()
+            self._prune()
+
+    def _prune(self):
+        """ 오래된 측정 파일부터 삭제하여 max_files개만 남긴다 (다른 워커의 파일 포함) """
+        file_names = sorted((name for name in os.listdir(self.profile_path)
+                             if PROFILE_FILE_PATTERN.match(name)),
+                            key=lambda name: int(name.split('-')[0]))
+        for file_name in file_names[:max(len(file_names) - max(self.max_files, 1), 0)]:
+            try:
+                os.remove(os.path.join(self.profile_path, file_name))
+            except OSError:
+                pass
+
+    def get_slowest(self, limit):
+        """ 최근 측정한 요청을 느린 순서로 limit개 반환한다 """
+        with self._lock:
+            records = list(self._records)
+        return heapq.nlargest(limit, records, key=lambda record: record._duration_ms)
+
+    def get_file_path(self, file_name):
+        """ 측정 파일 경로를 반환한다. 측정 파일 이름이 아니면 None을 반환한다. """
+        if not PROFILE_FILE_PATTERN.match(file_name):
+            return None
+        return os.path.join(self.profile_path, file_name)
+
+
+request_profiler = RequestProfiler(os.path.join(CONF_CACHE_PATH, "profiles"),
+                                   CONF_PROFILE_MAX_FILES)
+
+
+@app.before_request
+def start_request_profiler():
+    if CONF_PROFILE_ENABLED and request_profiler.should_profile():
+        flask.g.profiler = request_profiler.start()
+        flask.g.profile_start = time.perf_counter()
+
+
+# 응답 본문을 다 보낸 뒤(close) 측정을 마친다
+class ProfiledBody:
+    def __init__(self, body, finish):
+        self.body = body
+        self.finish = finish
+
+    def __iter__(self):
+        return iter(self.body)
+
+    def close(self):
+        try:
+            close = getattr(self.body, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            self.finish()
+
+
+@app.after_request
+def finish_request_profiler(response):
+    profiler = flask.g.pop('profiler', None)
+    if profiler is None:
+        return response
+    start = flask.g.pop('profile_start')
+    method = request.method
+    path = request.full_path if request.query_string else request.path
+    status = response.status_code
+
+    def finish():
+        request_profiler.stop(profiler)
+        request_profiler.save(profiler, time.perf_counter() - start, method, path, status)
+
+    # 스트리밍 응답은 본문 생성까지 측정한다. 파일 전송(sendfile)과 큰 응답은 본문을 측정하지 않는다.
+    if (response.is_sequence or hasattr(response.response, 'filelike')
+            or (response.content_length or 0) > PROFILE_MAX_BODY_SIZE):
+        finish()
+        return response
+    response.response = ProfiledBody(response.response, finish)
+    return response
+
+
+@app.teardown_request
+def release_request_profiler(exc):
+    # after_request 까지 도달하지 못한 경우 프로파일러를 정리한다
+    profiler = flask.g.pop('profiler', None)
+    if profiler is not None:
+        request_profiler.stop(profiler)
+
+
+# 요청 지표 기록
+@app.before_request
+def start_request_timer():
+    flask.g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    start = flask.g.pop('request_start', None)
+    if start is None:
+        return response
+    duration = time.perf_counter() - start
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    metrics.inc('lightcomics_http_requests_total', route=route, method=request.method,
+                status=response.status_code)
+    metrics.observe('lightcomics_http_request_duration_seconds', duration, route=route)
+    metrics.inc('lightcomics_http_response_bytes_total', response.content_length or 0, route=route)
+    logger.debug("%s %s %d %.1fms", request.method, request.path, response.status_code,
+                 duration * 1000)
+    return response
+
+
+# 볼륨별 I/O 작업 풀 (느리거나 잠든 디스크가 다른 볼륨의 요청까지 붙잡지 않도록 한다)
+# 경로를 받는 API는 라이브러리 폴더 이름과 겹치지 않도록 '/_api/' 아래에 둔다
+VOLUME_ROUTE_PREFIXES = ('/_api/folder/', '/_api/batch/', '/_api/covers/', '/_api/download/')
+
+
+# 현재 스레드가 실행 중인 볼륨 작업 풀 (요청 스레드는 None)
+class VolumeLocal(threading.local):
+    pool = None
+
+
+volume_local = VolumeLocal()
+
+
+# 볼륨으로 쓰지 않는 가상 파일시스템
+PSEUDO_FILESYSTEMS = {'proc', 'sysfs', 'devtmpfs', 'devpts', 'tmpfs', 'ramfs', 'cgroup', 'cgroup2',
+                      'securityfs', 'debugfs', 'tracefs', 'pstore', 'bpf', 'mqueue', 'hugetlbfs',
+                      'configfs', 'fusectl', 'binfmt_misc', 'autofs', 'overlay', 'nsfs', 'efivarfs'}
+
+
+def get_mount_fs_types():
+    """ 마운트 지점별 파일시스템 종류를 반환한다 (리눅스, /proc/self/mounts). 알 수 없으면 빈 dict를 반환한다. """
+    fs_types = {}
+    try:
+        with open('/proc/self/mounts', mode='r') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                # 공백 등은 8진수(\040)로 표기된다
+                mount_point = re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), fields[1])
+                fs_types[mount_point] = fields[2]
+    except OSError:
+        pass
+    return fs_types
+
+
+def find_mount_points(root_path, depth):
+    """ 루트(root_path) 아래 depth 단계까지의 마운트 지점을 반환한다. 마운트 지점 안으로는 내려가지 않고, 가상 파일시스템은 건너뛴다. """
+    fs_types = get_mount_fs_types() if IS_OS_LINUX else {}
+    mount_points = []
+    dir_paths = [root_path]
+    for _ in range(depth):
+        next_paths = []
+        for dir_path in dir_paths:
+            try:
+                entries = list(os.scandir(dir_path))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if not entry.is_dir(follow_symlinks=False) or is_hidden_or_trash(entry.name):
+                        continue
+                except OSError:
+                    continue
+                if os.path.ismount(entry.path):
+                    if fs_types.get(os.path.realpath(entry.path)) not in PSEUDO_FILESYSTEMS:
+                        mount_points.append(entry.path)
+                else:
+                    next_paths.append(entry.path)
+        dir_paths = next_paths
+    return mount_points
+
+
+class VolumePool:
+    def __init__(self, path, prefix, workers, queue_size):
+        self.path = path
+        # ROOT 기준 요청 경로 접두사 ("/" 로 끝난다)
+        self.prefix = prefix
+        self._executor = ThreadPoolExecutor(max_workers=max(workers, 1),
+                                            thread_name_prefix="volume")
+        # 실행 중인 작업과 대기 중인 작업을 합쳐 workers + queue_size 개까지 받는다
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + max(queue_size, 0))
+        # 이 볼륨의 크기 측정, 미리 읽기, 표지, 본문 전송 작업
+        self.executors = BackgroundExecutors()
+
+    def submit(self, fn):
+        """ 작업(fn)을 풀에 넣고 future를 반환한다. 대기열이 가득 차 있으면 None을 반환한다. """
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            future = self._executor.submit(fn)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._slots.release())
+        return future
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+        self.executors.shutdown()
+
+
+# 볼륨 작업 풀 관리
+class VolumeDispatcher:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.root_path = None
+        # 접두사가 긴 순서 (하위 볼륨이 먼저 일치한다)
+        self.pools = []
+
+    def start(self, root_path):
+        """ 설정된 볼륨(VOLUMES) 또는 루트 아래의 마운트 지점마다 작업 풀을 만든다. 볼륨이 없으면 요청 스레드에서 바로 처리한다. """
+        volume_paths = [os.path.join(root_path, path) for path in CONF_VOLUMES]
+        if not volume_paths and CONF_VOLUME_AUTO_DETECT:
+            volume_paths = find_mount_points(root_path, CONF_VOLUME_SCAN_DEPTH)
+
+        pools = []
+        for volume_path in volume_paths:
+            # 디스크를 깨우지 않도록 경로 문자열만으로 ROOT 기준 위치를 구한다
+            rel_path = os.path.relpath(os.path.normpath(volume_path),
+                                       os.path.normpath(root_path)).replace("\\", "/")
+            if rel_path == "." or rel_path == ".." or rel_path.startswith("../"):
+                logger.warning("volume is not under ROOT: %s", volume_path)
+                continue
+            pools.append(VolumePool(volume_path, "/" + rel_path + "/",
+                                    CONF_VOLUME_WORKERS, CONF_VOLUME_QUEUE_SIZE))
+        if pools:
+            # 어느 볼륨에도 속하지 않는 경로는 요청 스레드에서 바로 처리한다
+            pools.sort(key=lambda pool: len(pool.prefix), reverse=True)
+            logger.info("volumes: %s", ", ".join(pool.path for pool in pools))
+
+        with self._lock:
+            old_pools = self.pools
+            self.root_path = root_path
+            self.pools = pools
+        for pool in old_pools:
+            pool.shutdown()
+
+    def get_pool(self, path):
+        """ ROOT 기준 요청 경로(path)를 담당하는 작업 풀을 반환한다 """
+        path = path + "/"
+        for pool in self.pools:
+            if path.startswith(pool.prefix):
+                return pool
+        return None
+
+    def get_path_pool(self, file_path):
+        """ 실제 경로(file_path)를 담당하는 작업 풀을 반환한다. 볼륨이 없으면 None을 반환한다. """
+        if not self.pools:
+            return None
+        rel_path = os.path.relpath(os.path.normpath(file_path),
+                                   os.path.normpath(self.root_path)).replace("\\", "/")
+        return self.get_pool("/" + rel_path)
+
+
+volume_dispatcher = VolumeDispatcher()
+
+
+def get_request_volume_path():
+    """ 요청 경로에서 라우트 접두사를 뺀 ROOT 기준 경로를 반환한다 """
+    path = request.path
+    for prefix in VOLUME_ROUTE_PREFIXES:
+        if path.startswith(prefix):
+            return path[len(prefix) - 1:]
+    return path
+
+
+# 볼륨 작업 풀에서 실행
+def dispatch_to_volume(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        # 이미 작업 풀에서 실행 중이거나 프로파일링 중인 요청은 현재 스레드에서 처리한다
+        if (not volume_dispatcher.pools or volume_local.pool is not None
+                or flask.g.get('profiler') is not None):
+            return f(*args, **kwargs)
+        pool = volume_dispatcher.get_pool(get_request_volume_path())
+        if pool is None:
+            return f(*args, **kwargs)
+
+        def run():
+            volume_local.pool = pool
+            # 파일을 열고 검증하는 일까지만 작업 풀에서 하고, 본문은 그대로(sendfile) 보낸다
+            try:
+                return f(*args, **kwargs)
+            finally:
+                volume_local.pool = None
+
+        future = pool.submit(flask.copy_current_request_context(run))
+        if future is None:
+            metrics.inc('lightcomics_volume_rejected_total', volume=pool.prefix, reason='queue_full')
+            return ('', 503, {'Retry-After': '1'})
+        try:
+            return future.result(timeout=CONF_VOLUME_TIMEOUT or None)
+        except FutureTimeoutError:
+            # 작업은 풀에서 계속 진행되고 끝나면 대기열 자리를 돌려준다
+            metrics.inc('lightcomics_volume_rejected_total', volume=pool.prefix, reason='timeout')
+            return ('', 503, {'Retry-After': '1'})
+
+    return decorated
 
 
 # Flask 네트워크 맵핑 시작
@@ -403,30 +3221,42 @@ def root():
     리스팅
     localhost:12370/
     """
-    app.logger.info("@app.route('/')")
+    app.logger.debug("@app.route('/')")
 
     return rest_listing("")
 
 
 @app.route('/<path:req_path>/')
 @requires_authenticate
+@dispatch_to_volume
 def rest_listing(req_path):
     """
     리스팅
     localhost:12370/req_path/
+    localhost:12370/req_path/?offset=0&limit=100
     """
-    app.logger.info("@app.route('/<path:req_path>/')")
+    app.logger.debug("@app.route('/<path:req_path>/')")
 
     base_path = get_real_path(CONF_ROOT_PATH, "")
     full_path = "%s" % unquote(req_path)
     full_real_path = get_real_path(base_path, full_path)
     full_real_path = os.path.join(full_real_path, "").replace("\\", "/")
-    app.logger.info(full_real_path)
+    app.logger.debug(full_real_path)
 
-    model = get_listing_model(full_real_path)
-    data = json.dumps(model, indent=4, cls=LightEncoder)
-    response = flask.Response(data, headers=None, mimetype=BASE_MIME_TYPE)
-    return response
+    content_encoding = negotiate_content_encoding()
+    etag, last_modified = get_listing_validators(full_real_path, content_encoding)
+    if is_not_modified(etag, last_modified):
+        return make_not_modified_response(etag, last_modified)
+
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', type=int)
+    if offset < 0 or (limit is not None and limit < 0):
+        return ('', 400)
+
+    model = get_listing_model(full_real_path, offset, limit)
+    cover_generator.schedule(model._archives)
+    response = make_json_response(model, content_encoding)
+    return set_validators(response, etag, last_modified)
 
 
 @app.route('/<string:archive>.<string:archive_ext>/')
@@ -436,19 +3266,20 @@ def rest_load_image_model(archive, archive_ext):
     압축파일 내부 이미지 정보
     localhost:12370/sample.zip/
     """
-    app.logger.info("@app.route('/<string:archive>.<string:archive_ext>/')")
+    app.logger.debug("@app.route('/<string:archive>.<string:archive_ext>/')")
 
     return rest_load_image_model2("", archive, archive_ext)
 
 
 @app.route('/<path:req_path>/<string:archive>.<string:archive_ext>/')
 @requires_authenticate
+@dispatch_to_volume
 def rest_load_image_model2(req_path, archive, archive_ext):
     """
     압축파일 내부 이미지 정보
     localhost:12370/dir/sglee/sample.zip/
     """
-    app.logger.info(
+    app.logger.debug(
         "@app.route('/<path:req_path>/<string:archive>.<string:archive_ext>/')"
     )
 
@@ -456,33 +3287,40 @@ def rest_load_image_model2(req_path, archive, archive_ext):
     full_path = "%s" % unquote(req_path)
     full_real_path = get_real_path(base_path, full_path)
     full_real_path = os.path.join(full_real_path, "").replace("\\", "/")
-    app.logger.info(full_real_path)
+    app.logger.debug(full_real_path)
 
     archive_name = "%s" % unquote(archive) + "." + archive_ext
     archive_path = os.path.join(full_real_path,
                                 archive_name).replace("\\", "/")
 
-    app.logger.info(archive_path)
+    app.logger.debug(archive_path)
 
     mode = request.args.get('mode', "0")
-    app.logger.info("mode: " + mode)
+    app.logger.debug("mode: %s", mode)
+
+    if archive_ext.upper() not in ['ZIP', 'CBZ', 'RAR', 'CBR']:
+        return ('', 204)
+
+    stream = is_ndjson_requested()
+    content_encoding = None if stream else negotiate_content_encoding()
+    etag, last_modified = get_path_validators(archive_path, 'model',
+                                              request.query_string,
+                                              content_encoding, stream)
+    if is_not_modified(etag, last_modified):
+        return make_not_modified_response(etag, last_modified)
+
+    if stream:
+        # 앞 페이지부터 바로 보낼 수 있도록 크기를 구하는 대로 한 줄씩 보낸다
+        response = make_ndjson_response(iter_imagemodel_in_archive(archive_path, mode))
+        return set_validators(response, etag, last_modified)
 
     if archive_ext.upper() == 'ZIP' or archive_ext.upper() == 'CBZ':
         models = get_imagemodel_in_zip(archive_path, mode)
-        data = json.dumps(models, indent=4, cls=LightEncoder)
-        response = flask.Response(data,
-                                  headers=None,
-                                  mimetype=BASE_MIME_TYPE)
-        return response
-
-    elif archive_ext.upper() == 'RAR' or archive_ext.upper() == 'CBR':
+    else:
         models = get_imagemodel_in_rar(archive_path, mode)
-        data = json.dumps(models, indent=4, cls=LightEncoder)
-        response = flask.Response(
-            data, headers=None, mimetype=BASE_MIME_TYPE)
-        return response
 
-    return ('', 204)
+    response = make_json_response(models, content_encoding)
+    return set_validators(response, etag, last_modified)
 
 
 @app.route('/<string:archive>.<string:archive_ext>/<path:img_path>')
@@ -492,7 +3330,7 @@ def rest_load_image_data(archive, archive_ext, img_path):
     localhost:12370/sample.zip/img1.jpg
     localhost:12370/sample.zip/test/img1.jpg
     """
-    app.logger.info(
+    app.logger.debug(
         "@app.route('/<string:archive>.<string:archive_ext>/<path:img_path>')")
 
     return rest_load_image_data2("", archive, archive_ext, img_path)
@@ -500,13 +3338,15 @@ def rest_load_image_data(archive, archive_ext, img_path):
 
 @app.route(
     '/<path:req_path>/<string:archive>.<string:archive_ext>/<path:img_path>')
+@dispatch_to_volume
 def rest_load_image_data2(req_path, archive, archive_ext, img_path):
     """
     압축파일 내부 이미지 데이터 반환
     localhost:12370/dir/sglee/sample.zip/img1.jpg
     localhost:12370/dir/sglee/sample.zip/test/img1.jpg
+    localhost:12370/dir/sglee/sample.zip/img1.jpg?width=800&height=1200&quality=80
     """
-    app.logger.info(
+    app.logger.debug(
         "@app.route('/<path:req_path>/<string:archive>.<string:archive_ext>/<path:img_path>')"
     )
 
@@ -515,30 +3355,254 @@ def rest_load_image_data2(req_path, archive, archive_ext, img_path):
     full_real_path = get_real_path(base_path, full_path)
     full_real_path = os.path.join(full_real_path, "").replace("\\", "/")
 
-    app.logger.info(full_real_path)
+    app.logger.debug(full_real_path)
 
     archive_name = "%s" % unquote(archive) + "." + archive_ext
     archive_path = os.path.join(full_real_path,
                                 archive_name).replace("\\", "/")
 
-    app.logger.info(archive_path)
+    app.logger.debug(archive_path)
 
     img_path = unquote(img_path)
-    app.logger.info(img_path)
+    app.logger.debug(img_path)
 
-    if archive_ext.upper() == 'ZIP' or archive_ext.upper() == 'CBZ':
-        img = get_image_data_in_zip(archive_path, img_path)
-        return flask.send_file(img,
-                               attachment_filename=os.path.basename(img_path),
-                               as_attachment=True)
+    if archive_ext.upper() not in ['ZIP', 'CBZ', 'RAR', 'CBR']:
+        return ('', 204)
 
-    if archive_ext.upper() == 'RAR' or archive_ext.upper() == 'CBR':
-        img = get_image_data_in_rar(archive_path, img_path)
-        return flask.send_file(img,
-                               attachment_filename=os.path.basename(img_path),
-                               as_attachment=True)
+    try:
+        resize_params = get_resize_params()
+    except ValueError:
+        return ('', 400)
 
-    return ('', 204)
+    etag, last_modified = get_path_validators(archive_path, 'page', img_path,
+                                              resize_params)
+    if is_not_modified(etag, last_modified):
+        return make_not_modified_response(etag, last_modified, CONF_PAGE_MAX_AGE)
+
+    if resize_params is not None:
+        response = make_resized_page_response(archive_path, img_path,
+                                              resize_params, etag)
+    else:
+        page_prefetcher.schedule(request.remote_addr,
+                                 archive_cache.get(archive_path), img_path)
+        response = make_archive_page_response(archive_path, img_path, etag)
+    if response is None:
+        return ('', 404)
+
+    return set_validators(response, etag, last_modified, CONF_PAGE_MAX_AGE)
+
+
+@requires_authenticate
+def rest_load_folder_model(req_path):
+    """
+    이미지 폴더 내부 이미지 정보 (압축파일과 같은 형식)
+    localhost:12370/_api/folder/dir/sglee/chapter01/
+    """
+    app.logger.debug("@app.route('/_api/folder/<path:req_path>/')")
+
+    base_path = get_real_path(CONF_ROOT_PATH, "")
+    full_real_path = os.path.join(get_real_path(base_path, req_path), "").replace("\\", "/")
+    app.logger.debug(full_real_path)
+
+    # ROOT 밖의 폴더는 읽지 않는다
+    if not is_path_in_root(full_real_path) or not os.path.isdir(full_real_path):
+        return ('', 404)
+
+    mode = request.args.get('mode', "0")
+    content_encoding = negotiate_content_encoding()
+    etag, last_modified = get_path_validators(full_real_path, 'folder',
+                                              request.query_string,
+                                              content_encoding)
+    if is_not_modified(etag, last_modified):
+        return make_not_modified_response(etag, last_modified)
+
+    models = get_imagemodel_in_dir(full_real_path, mode)
+    response = make_json_response(models, content_encoding)
+    return set_validators(response, etag, last_modified)
+
+
+@app.route('/_api/folder/<path:req_path>')
+@dispatch_to_volume
+def rest_load_folder_image(req_path):
+    """
+    이미지 폴더 내부 이미지 데이터 반환
+    localhost:12370/_api/folder/dir/sglee/chapter01/img1.jpg
+    localhost:12370/_api/folder/dir/sglee/chapter01/img1.jpg?width=800&height=1200&quality=80
+    """
+    app.logger.debug("@app.route('/_api/folder/<path:req_path>')")
+
+    # 이미지 이름이 압축파일 규칙('/<archive>.<ext>/')과 겹쳐 슬래시 리다이렉트되지 않도록
+    # 폴더 정보('/_api/folder/<path>/')도 이 규칙에서 나눠 처리한다
+    if req_path.endswith('/'):
+        return rest_load_folder_model(req_path)
+
+    base_path = get_real_path(CONF_ROOT_PATH, "")
+    file_path = get_real_path(base_path, req_path)
+    app.logger.debug(file_path)
+
+    # ROOT 밖의 파일은 내려주지 않는다
+    if (not is_path_in_root(file_path)
+            or not is_extensions_allow_image(file_path)
+            or not os.path.isfile(file_path)):
+        return ('', 404)
+
+    try:
+        resize_params = get_resize_params()
+    except ValueError:
+        return ('', 400)
+
+    etag, last_modified = get_path_validators(file_path, 'page', resize_params)
+    if is_not_modified(etag, last_modified):
+        return make_not_modified_response(etag, last_modified, CONF_PAGE_MAX_AGE)
+
+    dir_path, img_name = os.path.split(file_path)
+    if resize_params is not None:
+        response = make_resized_page_response(dir_path, img_name, resize_params, etag)
+    else:
+        response = make_file_range_response(file_path, 0, os.path.getsize(file_path),
+                                            img_name, etag)
+    if response is None:
+        return ('', 404)
+
+    return set_validators(response, etag, last_modified, CONF_PAGE_MAX_AGE)
+
+
+@app.route('/_api/batch/<path:req_path>')
+@requires_authenticate
+@dispatch_to_volume
+def rest_load_image_batch(req_path):
+    """
+    압축파일 내부 이미지 여러 개를 한 번에 반환 (multipart/mixed)
+    localhost:12370/_api/batch/dir/sglee/sample.zip?name=img1.jpg&name=img2.jpg
+    localhost:12370/_api/batch/dir/sglee/sample.zip?start=10&count=20
+    """
+    app.logger.debug("@app.route('/_api/batch/<path:req_path>')")
+
+    base_path = get_real_path(CONF_ROOT_PATH, "")
+    archive_path = remove_trail_slash(get_real_path(base_path, req_path))
+    app.logger.debug(archive_path)
+
+    if (not is_path_in_root(archive_path)
+            or not is_extensions_allow_archive(archive_path)
+            or not os.path.isfile(archive_path)):
+        return ('', 404)
+
+    handle = archive_cache.get(archive_path)
+    try:
+        names = get_batch_names(handle)
+    except ValueError:
+        return ('', 400)
+    if not names:
+        return ('', 404)
+
+    etag, last_modified = get_path_validators(archive_path, 'batch', *names)
+    if is_not_modified(etag, last_modified):
+        return make_not_modified_response(etag, last_modified, CONF_PAGE_MAX_AGE)
+
+    response = make_batch_response(archive_path, names, etag)
+    return set_validators(response, etag, last_modified, CONF_PAGE_MAX_AGE)
+
+
+@app.route('/_api/covers/', defaults={'req_path': ""})
+@app.route('/_api/covers/<path:req_path>')
+@requires_authenticate
+@dispatch_to_volume
+def rest_load_cover_batch(req_path):
+    """
+    폴더 내 압축파일 표지 썸네일을 한 번에 반환 (multipart/mixed)
+    localhost:12370/_api/covers/dir/sglee/?offset=0&limit=100
+    localhost:12370/_api/covers/dir/sglee/?name=sample1.zip&name=sample2.zip
+    """
+    app.logger.debug("@app.route('/_api/covers/<path:req_path>')")
+
+    base_path = get_real_path(CONF_ROOT_PATH, "")
+    full_real_path = get_real_path(base_path, unquote(req_path))
+    full_real_path = os.path.join(full_real_path, "").replace("\\", "/")
+    app.logger.debug(full_real_path)
+
+    if not is_path_in_root(full_real_path) or not os.path.isdir(full_real_path):
+        return ('', 404)
+
+    try:
+        names = get_cover_names(get_listing_entry(full_real_path))
+    except ValueError:
+        return ('', 400)
+
+    identities = []
+    for name in names:
+        try:
+            identities.append(get_archive_identity(full_real_path + name))
+        except OSError:
+            continue
+    if not identities:
+        return ('', 404)
+
+    etag = make_etag(CONF_ROOT_PATH, 'covers', CONF_COVER_WIDTH, CONF_COVER_HEIGHT,
+                     CONF_COVER_QUALITY, *identities)
+    last_modified = max(identity[2] for identity in identities) // 1000000000
+    if is_not_modified(etag, last_modified):
+        return make_not_modified_response(etag, last_modified, CONF_PAGE_MAX_AGE)
+
+    response = make_cover_batch_response(full_real_path, names, etag)
+    if response is None:
+        return ('', 404)
+
+    return set_validators(response, etag, last_modified, CONF_PAGE_MAX_AGE)
+
+
+@app.route('/_api/download/<path:req_path>')
+@requires_authenticate
+@dispatch_to_volume
+def rest_download_archive(req_path):
+    """
+    압축파일 다운로드 (Range 요청으로 이어받기 가능)
+    localhost:12370/_api/download/dir/sglee/sample.zip
+    """
+    app.logger.debug("@app.route('/_api/download/<path:req_path>')")
+
+    base_path = get_real_path(CONF_ROOT_PATH, "")
+    archive_path = remove_trail_slash(get_real_path(base_path, req_path))
+    app.logger.debug(archive_path)
+
+    # ROOT 밖의 파일은 내려주지 않는다
+    if (not is_path_in_root(archive_path)
+            or not is_extensions_allow_archive(archive_path)
+            or not os.path.isfile(archive_path)):
+        return ('', 404)
+
+    etag, last_modified = get_path_validators(archive_path, 'download')
+    if is_not_modified(etag, last_modified):
+        return make_not_modified_response(etag, last_modified)
+
+    response = make_file_range_response(archive_path, 0, os.path.getsize(archive_path),
+                                        os.path.basename(archive_path), etag,
+                                        get_download_buckets())
+    return set_validators(response, etag, last_modified)
+
+
+@app.route('/search')
+@requires_authenticate
+def rest_search():
+    """
+    라이브러리의 디렉토리, 압축파일 이름 검색
+    localhost:12370/search?q=원피스&limit=50
+    """
+    if not CONF_CATALOG_ENABLED:
+        return ('', 503)
+
+    query = request.args.get('q', "")
+    limit = min(max(request.args.get('limit', CONF_SEARCH_LIMIT, type=int), 1), 1000)
+
+    models = []
+    for score, path, kind, name in search_index.search(query, limit):
+        model = BaseSearchResultModel()
+        model._path = path
+        model._name = name
+        model._type = kind
+        model._score = round(score, 4)
+        models.append(model)
+
+    return make_json_response(models, negotiate_content_encoding())
 
 
 @app.route('/id/<path:req_path>')
@@ -548,25 +3612,76 @@ def rest_get_identifier(req_path):
     해당하는 경로의 파일 identifier를 반환한다.
     localhost:12370/dir/hello.zip
     """
-    app.logger.info("@app.route('/id/<path:req_path>')")
+    app.logger.debug("@app.route('/id/<path:req_path>')")
 
     base_path = get_real_path(CONF_ROOT_PATH, "")
     full_path = "%s" % unquote(req_path)
     full_real_path = get_real_path(base_path, full_path)
     full_real_path = os.path.join(full_real_path, "").replace("\\", "/")
-    app.logger.info(full_real_path)
+    app.logger.debug(full_real_path)
 
     model = BaseIdentifierModel()
     model._path = remove_trail_slash(full_real_path)
     model._identifier = get_unique_identifier(full_real_path)
 
-    data = json.dumps(model, indent=4, cls=LightEncoder)
-    response = flask.Response(data, headers=None, mimetype=BASE_MIME_TYPE)
-    return response
+    content_encoding = negotiate_content_encoding()
+    etag = make_etag(model._path, model._identifier, request.query_string,
+                     content_encoding)
+    if is_not_modified(etag):
+        return make_not_modified_response(etag)
+
+    response = make_json_response(model, content_encoding)
+    return set_validators(response, etag)
+
+
+@app.route('/metrics')
+@requires_authenticate
+def rest_metrics():
+    """
+    Prometheus 지표
+    localhost:12370/metrics
+    """
+    return flask.Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/profiles')
+@requires_authenticate
+def rest_profiles():
+    """
+    최근 측정한 요청 중 느린 요청 목록 (PROFILE_ENABLED)
+    localhost:12370/profiles?limit=20
+    """
+    if not CONF_PROFILE_ENABLED:
+        return ('', 404)
+
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 1000)
+    return make_json_response(request_profiler.get_slowest(limit), negotiate_content_encoding())
+
+
+@app.route('/profiles/<string:file_name>')
+@requires_authenticate
+def rest_profile_file(file_name):
+    """
+    측정 파일 (pstats 형식)
+    localhost:12370/profiles/1700000000000-1234-5678.prof
+    """
+    if not CONF_PROFILE_ENABLED:
+        return ('', 404)
+
+    file_path = request_profiler.get_file_path(file_name)
+    if file_path is None or not os.path.isfile(file_path):
+        return ('', 404)
+    return flask.send_file(file_path, mimetype='application/octet-stream',
+                           as_attachment=True, download_name=file_name)
 
 
 @app.route('/stop')
+@requires_authenticate
 def rest_stop_server_by_request():
+    if 'gunicorn' in request.environ.get('SERVER_SOFTWARE', ''):
+        # 운영 서버는 프로세스 관리자가 보내는 SIGTERM/SIGHUP 으로만 종료한다
+        return ('', 404)
+
     func = request.environ.get('werkzeug.server.shutdown')
     if func is None:
         raise RuntimeError('Not running with the Werkzeug Server')
@@ -575,8 +3690,54 @@ def rest_stop_server_by_request():
     app.logger.info("shutdown...")
 
 
+# 운영 서버 (gunicorn)
+if IS_INSTALLED_GUNICORN_MODULE:
+    class ProductionServer(BaseApplication):
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+
+def run_production_server(host, port):
+    """ gunicorn 멀티 프로세스/멀티 스레드 서버로 앱을 실행한다 """
+    options = {
+        'bind': "%s:%s" % (host, port),
+        'workers': CONF_WORKERS,
+        'threads': CONF_THREADS,
+        'worker_class': 'gthread',
+        'keepalive': CONF_KEEPALIVE,
+        'timeout': CONF_TIMEOUT,
+        'graceful_timeout': CONF_GRACEFUL_TIMEOUT,
+        'post_fork': lambda server, worker: start_background_services(),
+    }
+    # 워커마다 따로 속도를 재므로 전체 제한이 워커 수만큼 늘지 않도록 나눠 준다
+    share_download_bucket(CONF_WORKERS)
+    ProductionServer(app, options).run()
+
+
+def run_server(host, port):
+    """ 설정(SERVER_MODE)에 따라 개발 서버 또는 운영 서버로 앱을 실행한다 """
+    if CONF_SERVER_MODE == "production":
+        if IS_INSTALLED_GUNICORN_MODULE:
+            run_production_server(host, port)
+            return
+        app.logger.warning("gunicorn 모듈이 설치되어 있지 않아 개발 서버로 실행합니다.")
+
+    start_background_services()
+    app.run(host=host, port=port, threaded=True)
+
+
 # UI 구현 for Windows or Mac OSX
 server_run = False
+root_path_selected = False
 
 
 def on_click_server_state():
@@ -611,12 +3772,14 @@ def start_server():
     host = local_ip.get()
     if IS_OS_MACOSX:
         host = "0.0.0.0"  # check after
+    # 폴더를 고르지 않았으면 기본 경로(디스크 전체)를 색인하지 않는다
+    start_background_services(catalog=root_path_selected)
     app.run(host=host, port=CONF_SERVER_PORT)
 
 
 def shutdown_server():
     URL = "http://" + CONF_HOST + ":" + str(CONF_SERVER_PORT) + "/stop"
-    requests.get(URL)
+    requests.get(URL, auth=('LightComics', CONF_PASSWORD))
     app.logger.info("Sever Stopped")
 
 
@@ -647,12 +3810,16 @@ def update_password():
 
 def update_root_path():
     global CONF_ROOT_PATH
+    global root_path_selected
     if server_run == True:
         tk.messagebox.showinfo("알림", "서버 가동중에 경로를 변경할 수 없습니다.")
         return
 
     folder_selected = filedialog.askdirectory()
+    if not folder_selected:
+        return
     CONF_ROOT_PATH = folder_selected
+    root_path_selected = True
     root_path_var.set(CONF_ROOT_PATH)
     app.logger.info(CONF_ROOT_PATH)
 
@@ -754,7 +3921,7 @@ if __name__ == '__main__':
         application_userinterface()
 
     elif IS_OS_LINUX:
-        app.run(host=CONF_HOST, port=CONF_SERVER_PORT)
+        run_server(CONF_HOST, CONF_SERVER_PORT)
 
     else:
         print("운영체제를 알 수 없습니다.")
@@ -0,0 +1,22 @@
+import json
+import os
+import sys
+import tempfile
+
+# 리눅스에서는 lightcomics 모듈을 불러올 때 현재 디렉토리의 lightcomics.json을 읽으므로
+# 임시 디렉토리에 설정 파일을 만들고 그 위치에서 모듈을 불러온다
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORK_PATH = tempfile.mkdtemp(prefix="lightcomics-test-")
+ROOT_PATH = os.path.join(WORK_PATH, "root")
+os.makedirs(ROOT_PATH)
+with open(os.path.join(WORK_PATH, "lightcomics.json"), "w") as f:
+    json.dump({
+        "ROOT": ROOT_PATH,
+        "PORT": 12370,
+        "HOST": "127.0.0.1",
+        "PASSWORD": "",
+        "CACHE_PATH": os.path.join(WORK_PATH, "cache"),
+        "CATALOG_ENABLED": False,
+    }, f)
+os.chdir(WORK_PATH)
+sys.path.insert(0, REPO_PATH)
@@ -0,0 +1,124 @@
+import struct
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+import lightcomics
+
+
+def read_size(data):
+    return lightcomics.get_image_size_from_header(lightcomics.ImageHeaderReader(BytesIO(data)))
+
+
+def make_jpeg(width, height, **kwargs):
+    data = BytesIO()
+    Image.new("RGB", (width, height)).save(data, "JPEG", **kwargs)
+    return data.getvalue()
+
+
+def make_tiff(byte_order, field_type, width, height):
+    """ 첫번째 IFD에 ImageWidth(256), ImageLength(257) 태그만 있는 TIFF 헤더를 만든다 """
+    signature = b'II*\x00' if byte_order == '<' else b'MM\x00*'
+    header = signature + struct.pack(byte_order + 'I', 8)
+    entries = [(254, 4, 1, 0)]
+    entries += [(256, field_type, 1, width), (257, field_type, 1, height)]
+    ifd = struct.pack(byte_order + 'H', len(entries))
+    for tag, entry_type, count, value in entries:
+        if entry_type == 3:
+            value_bytes = struct.pack(byte_order + 'HH', value, 0)
+        else:
+            value_bytes = struct.pack(byte_order + 'I', value)
+        ifd += struct.pack(byte_order + 'HHI', tag, entry_type, count) + value_bytes
+    return header + ifd + struct.pack(byte_order + 'I', 0)
+
+
+def test_jpeg_baseline():
+    assert read_size(make_jpeg(33, 17)) == (33, 17)
+
+
+def test_jpeg_progressive():
+    data = make_jpeg(640, 480, progressive=True)
+    assert b'\xff\xc2' in data
+    assert read_size(data) == (640, 480)
+
+
+def test_jpeg_with_fill_bytes():
+    data = make_jpeg(120, 45)
+    # 마커 앞의 0xff 채움 바이트는 건너뛰어야 한다
+    assert read_size(data[:2] + b'\xff\xff\xff' + data[2:]) == (120, 45)
+
+
+def test_jpeg_with_standalone_markers():
+    data = make_jpeg(8, 9)
+    assert read_size(data[:2] + b'\xff\xd0\xff\x01' + data[2:]) == (8, 9)
+
+
+def test_jpeg_invalid_marker():
+    with pytest.raises(ValueError):
+        read_size(b'\xff\xd8\x00\x00' + b'\x00' * 16)
+
+
+def test_jpeg_truncated():
+    data = make_jpeg(10, 10)
+    with pytest.raises(ValueError):
+        read_size(data[:20])
+
+
+def test_png():
+    data = BytesIO()
+    Image.new("RGB", (300, 200)).save(data, "PNG")
+    assert read_size(data.getvalue()) == (300, 200)
+
+
+def test_gif():
+    data = BytesIO()
+    Image.new("P", (31, 7)).save(data, "GIF")
+    assert read_size(data.getvalue()) == (31, 7)
+
+
+def test_bmp_windows_bottom_up_and_top_down():
+    data = BytesIO()
+    Image.new("RGB", (21, 13)).save(data, "BMP")
+    data = data.getvalue()
+    assert read_size(data) == (21, 13)
+    top_down = data[:22] + struct.pack('<i', -13) + data[26:]
+    assert read_size(top_down) == (21, 13)
+
+
+def test_bmp_os2():
+    # BITMAPCOREHEADER: 헤더 크기 12, 폭/높이는 unsigned short
+    data = b'BM' + struct.pack('<IHHI', 26 + 6, 0, 0, 26)
+    data += struct.pack('<IHHHH', 12, 1000, 700, 1, 24) + b'\x00' * 6
+    assert read_size(data) == (1000, 700)
+
+
+@pytest.mark.parametrize("byte_order", ['<', '>'])
+@pytest.mark.parametrize("field_type", [3, 4])
+def test_tiff(byte_order, field_type):
+    width, height = (1200, 1800) if field_type == 3 else (70000, 90000)
+    assert read_size(make_tiff(byte_order, field_type, width, height)) == (width, height)
+
+
+def test_tiff_from_pillow():
+    data = BytesIO()
+    Image.new("RGB", (33, 17)).save(data, "TIFF")
+    assert read_size(data.getvalue()) == (33, 17)
+
+
+def test_tiff_without_size_tag():
+    data = b'II*\x00' + struct.pack('<IH', 8, 1) + struct.pack('<HHII', 254, 4, 1, 0)
+    with pytest.raises(ValueError):
+        read_size(data + b'\x00' * 4)
+
+
+def test_unknown_format():
+    assert read_size(b'RIFF\x00\x00\x00\x00WEBP') is None
+
+
+def test_header_reader_reads_only_what_is_needed():
+    data = make_jpeg(50, 60) + b'\x00' * 100000
+    stream = BytesIO(data)
+    reader = lightcomics.ImageHeaderReader(stream)
+    assert lightcomics.get_image_size_from_header(reader) == (50, 60)
+    assert len(reader.buffer) < 4096
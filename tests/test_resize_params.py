@@ -0,0 +1,35 @@
+import pytest
+
+import lightcomics
+
+
+def get_resize_params(query_string):
+    with lightcomics.app.test_request_context("/a.zip/1.jpg?" + query_string):
+        return lightcomics.get_resize_params()
+
+
+def test_not_a_resize_request():
+    assert get_resize_params("") is None
+    assert get_resize_params("quality=50") is None
+
+
+def test_sizes_are_rounded_up_to_steps():
+    assert get_resize_params("width=800") == (800, None, 80)
+    assert get_resize_params("width=801&height=1") == (1024, 160, 80)
+    assert get_resize_params("height=4096&quality=81") == (None, 4096, 90)
+
+
+@pytest.mark.parametrize("query_string", [
+    "width=0", "width=-1", "width=4097", "width=abc", "width=1e3", "width=",
+    "height=100000000", "width=800&quality=0", "width=800&quality=96",
+    "width=800&quality=high",
+])
+def test_invalid_values_are_rejected(query_string):
+    with pytest.raises(ValueError):
+        get_resize_params(query_string)
+
+
+def test_invalid_values_return_400():
+    client = lightcomics.app.test_client()
+    response = client.get("/a.zip/1.jpg?width=99999")
+    assert response.status_code == 400
@@ -0,0 +1,133 @@
+import unicodedata
+
+import lightcomics
+
+
+def make_entry(directories=(), archives=()):
+    return lightcomics.CatalogDirectory(0, list(directories), list(archives), [], [])
+
+
+def search_names(index, query, limit=10):
+    return [name for score, path, kind, name in index.search(query, limit)]
+
+
+def make_index():
+    index = lightcomics.SearchIndex()
+    index.update_directory("/root", make_entry(
+        directories=["One Piece", "Dragon Ball"],
+        archives=["Piece of Cake.cbz", "The One Piece Collection.zip", "Naruto v01.cbz"]))
+    return index
+
+
+def test_prefix_match_ranks_before_substring_match():
+    names = search_names(make_index(), "piece")
+    assert names[0] == "Piece of Cake.cbz"
+    assert set(names[1:3]) == {"One Piece", "The One Piece Collection.zip"}
+
+
+def test_shorter_name_ranks_first_among_equal_matches():
+    names = search_names(make_index(), "one piece")
+    assert names[:2] == ["One Piece", "The One Piece Collection.zip"]
+
+
+def test_exact_match_ranks_before_fuzzy_match():
+    results = make_index().search("naruto", 10)
+    assert results[0][3] == "Naruto v01.cbz"
+    assert results[0][0] > 2
+    assert all(score <= 1 for score, path, kind, name in results[1:])
+
+
+def test_fuzzy_match_with_typo():
+    assert search_names(make_index(), "dragn ball")[0] == "Dragon Ball"
+
+
+def test_case_and_normalization_are_ignored():
+    index = lightcomics.SearchIndex()
+    index.update_directory("/root", make_entry(directories=["진격의 거인"]))
+    assert search_names(index, "진격") == ["진격의 거인"]
+    assert search_names(make_index(), "ONE PIECE")[0] == "One Piece"
+
+
+def test_result_path_and_kind():
+    results = make_index().search("naruto", 1)
+    assert results[0][1:] == ("/root/Naruto v01.cbz", "archive", "Naruto v01.cbz")
+
+
+def test_short_queries():
+    index = make_index()
+    assert search_names(index, "na") == ["Naruto v01.cbz"]
+    assert "Naruto v01.cbz" in search_names(index, "v")
+    assert index.search("  ", 10) == []
+
+
+def test_limit():
+    assert len(make_index().search("e", 2)) == 2
+
+
+def test_incremental_add_and_remove():
+    index = make_index()
+    index.update_directory("/root/One Piece", make_entry(archives=["One Piece v01.cbz"]))
+    assert "One Piece v01.cbz" in search_names(index, "one piece v01")
+
+    # 이름이 바뀌면 이전 이름은 더 이상 검색되지 않는다
+    index.update_directory("/root", make_entry(
+        directories=["One Piece", "Dragon Ball Z"],
+        archives=["Piece of Cake.cbz", "The One Piece Collection.zip", "Naruto v01.cbz"]))
+    assert "Dragon Ball" not in search_names(index, "dragon ball")
+    assert search_names(index, "dragon ball")[0] == "Dragon Ball Z"
+
+    # 디렉토리가 삭제되면(None) 하위 항목도 검색되지 않는다
+    index.update_directory("/root/One Piece", None)
+    assert "One Piece v01.cbz" not in search_names(index, "one piece v01")
+    assert "/root/One Piece" not in index._dir_children
+
+
+def test_removed_documents_are_compacted():
+    index = lightcomics.SearchIndex()
+    for i in range(30):
+        names = ["Series %d volume %d.cbz" % (i, v) for v in range(200)]
+        index.update_directory("/root", make_entry(archives=names))
+    assert len(index._docs) == 200
+    assert index._posting_count <= 4 * 20 * 1000
+    assert search_names(index, "series 29 volume 7.cbz", 1) == ["Series 29 volume 7.cbz"]
+    assert not [name for name in search_names(index, "series 0 volume", 200)
+                if name.startswith("Series 0 ")]
+
+
+def test_candidates_are_capped(monkeypatch):
+    monkeypatch.setattr(lightcomics, "SEARCH_MAX_CANDIDATES", 10)
+    index = lightcomics.SearchIndex()
+    index.update_directory("/root", make_entry(archives=["Book %03d.cbz" % i for i in range(100)]))
+    assert len(index.search("b", 100)) == 10
+    assert len(index.search("book", 100)) == 10
+    assert len(index.search("bokk", 100)) <= 10
+
+
+def test_accented_names_are_kept():
+    index = lightcomics.SearchIndex()
+    index.update_directory("/root", make_entry(directories=["Pokémon"], archives=["Über.cbz"]))
+    assert search_names(index, "pokémon") == ["Pokémon"]
+    assert search_names(index, "kém") == ["Pokémon"]
+    assert search_names(index, "über")[0] == "Über.cbz"
+
+
+def test_decomposed_query_matches_composed_name():
+    index = lightcomics.SearchIndex()
+    index.update_directory("/root", make_entry(directories=["Pokémon"]))
+    assert search_names(index, unicodedata.normalize("NFD", "Pokémon")) == ["Pokémon"]
+
+
+def test_cp437_mojibake_is_searchable_by_repaired_name():
+    mojibake = "한글만화.zip".encode("cp949").decode("cp437")
+    index = lightcomics.SearchIndex()
+    index.update_directory("/root", make_entry(archives=[mojibake]))
+    results = index.search("한글만화", 10)
+    assert [name for score, path, kind, name in results] == [mojibake]
+    assert results[0][1] == "/root/" + mojibake
+    assert search_names(index, mojibake) == [mojibake]
+
+
+def test_get_repaired_name():
+    assert lightcomics.get_repaired_name("한글".encode("cp949").decode("cp437")) == "한글"
+    assert lightcomics.get_repaired_name("plain.cbz") is None
+    assert lightcomics.get_repaired_name("한글.cbz") is None